@@ -16,12 +16,16 @@
 
 
 import streamlit as st
+import threading
 import warnings
 import pandas as pd
 
 # Import simplifié grâce aux __init__.py
-from core import PDFProcessor, DataProcessor, FileExporter, OdooConnector, Config
-from utils import save_uploaded_file, cleanup_temp_file
+from core import (
+    PDFProcessor, FileExporter, OdooConnector, Config, DiskCache, StageProfiler,
+    EventBus, InvoicePipeline, OdooConnectionPool,
+)
+from core.disk_cache import content_key
 
 warnings.filterwarnings('ignore')
 
@@ -37,23 +41,124 @@ st.set_page_config(
 # =============================================================================
 # Initialisation des classes
 # =============================================================================
+def show_event(event):
+    """Affiche dans la page les messages publiés par le traitement"""
+    if event.level in ('info', 'success', 'warning', 'error'):
+        getattr(st, event.level)(event.message)
+
 @st.cache_resource
 def get_processors():
     """Initialise et cache les processeurs"""
-    return PDFProcessor(), DataProcessor(), FileExporter(), OdooConnector()
+    return PDFProcessor(), FileExporter()
+
+@st.cache_resource
+def get_odoo_pool():
+    """Connexions Odoo authentifiées, partagées entre les sessions"""
+    return OdooConnectionPool()
+
+def get_session_connector():
+    """
+    Connecteur Odoo propre à la session : ses messages ne s'affichent que dans
+    cette session, et sa connexion, prise dans le pool, n'est prêtée qu'à elle.
+    Elle revient au pool à la fin de la session.
+    """
+    if 'odoo_connector' not in st.session_state:
+        odoo_events = EventBus()
+        odoo_events.subscribe(show_event)
+        st.session_state['odoo_connector'] = OdooConnector(
+            odoo_events,
+            snapshot_dir=f"{Config.CACHE_DIR}/odoo",
+            pool=get_odoo_pool(),
+        )
+    return st.session_state['odoo_connector']
 
-pdf_processor, data_processor, file_exporter, odoo_connector = get_processors()
+@st.cache_resource
+def get_caches():
+    """Caches disque des lignes de factures et des correspondances déjà analysées"""
+    extraction_cache = DiskCache(
+        f"{Config.CACHE_DIR}/factures",
+        Config.EXTRACTION_CACHE_MAX_BYTES,
+    )
+    correspondance_cache = DiskCache(
+        f"{Config.CACHE_DIR}/correspondance",
+        Config.CORRESPONDANCE_CACHE_MAX_BYTES,
+    )
+    catalog_cache = DiskCache(
+        f"{Config.CACHE_DIR}/catalogue",
+        Config.ODOO_CATALOG_CACHE_MAX_BYTES,
+    )
+    return extraction_cache, correspondance_cache, catalog_cache
+
+pdf_processor, file_exporter = get_processors()
+odoo_connector = get_session_connector()
+extraction_cache, correspondance_cache, catalog_cache = get_caches()
 config = Config()
 
 # =============================================================================
 # Gestion de la connexion Odoo et cache des données
 # =============================================================================
-@st.cache_data(ttl=3600)  # Cache pendant 1 heure
-def get_odoo_articles(_odoo_connector, url, port, database, username, password):
-    """Récupère et cache les articles depuis Odoo"""
-    if _odoo_connector.connect(url, port, database, username, password):
-        return _odoo_connector.get_product_variants()
-    return None
+def catalog_cache_key(url, port, database):
+    """Clé du catalogue en cache : serveur et base, indépendamment de l'utilisateur"""
+    return content_key(str(url), str(port), str(database))
+
+def get_odoo_articles(odoo_connector, url, port, database, username, password, refresh=False):
+    """
+    Récupère les articles depuis Odoo, via le cache disque du catalogue.
+
+    La connexion est toujours établie (vérification des identifiants) ; le
+    catalogue n'est téléchargé que si le cache est absent, trop ancien
+    (Config.ODOO_CATALOG_CACHE_TTL) ou si refresh est demandé.
+
+    Returns:
+        pd.DataFrame: Catalogue des articles, ou None en cas d'échec
+    """
+    if not odoo_connector.connect(url, port, database, username, password):
+        return None
+
+    key = catalog_cache_key(url, port, database)
+    if not refresh:
+        df_articles = catalog_cache.get(key, max_age=Config.ODOO_CATALOG_CACHE_TTL)
+        if df_articles is not None:
+            return df_articles
+
+    df_articles = odoo_connector.get_product_variants()
+    if df_articles is not None:
+        catalog_cache.put(key, df_articles)
+    return df_articles
+
+@st.cache_resource
+def warm_catalog_cache():
+    """
+    Au démarrage de l'application, télécharge en arrière-plan le catalogue de
+    la connexion configurée dans les secrets s'il est absent ou trop ancien.
+    """
+    try:
+        settings = dict(st.secrets.get("odoo", {}))
+    except Exception:
+        return None
+    if not settings.get("username") or not settings.get("password"):
+        return None
+
+    url = settings.get("url", "odoo.demainsupermarche.org")
+    port = settings.get("port", 443)
+    database = settings.get("database", "demain")
+    age = catalog_cache.age(catalog_cache_key(url, port, database))
+    if age is not None and age <= Config.ODOO_CATALOG_CACHE_TTL:
+        return None
+
+    # Connecteur dédié : le téléchargement ne s'affiche dans aucune session
+    connector = OdooConnector(snapshot_dir=f"{Config.CACHE_DIR}/odoo")
+    thread = threading.Thread(
+        target=get_odoo_articles,
+        args=(connector, url, port, database, settings["username"], settings["password"]),
+        kwargs={'refresh': True},
+        name="catalogue-odoo",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+catalog_warmup = warm_catalog_cache()
 
 # =============================================================================
 # Interface utilisateur
@@ -67,6 +172,8 @@ st.markdown("""Cette application permet de convertir une facture relais local au
 st.sidebar.header("Paramètres")
 ref_commande = st.sidebar.text_input("Référence commande", value=config.REF_COMMANDE_DEFAULT)
 id_fourni = st.sidebar.text_input("ID Fournisseur", value=config.ID_FOURNI_DEFAULT)
+if st.sidebar.button("Vider le cache des factures"):
+    st.sidebar.success(f"{extraction_cache.clear()} facture(s) retirée(s) du cache")
 
 # =============================================================================
 # Section : Choix de la source des articles
@@ -111,16 +218,60 @@ if source_mode == "Connexion Odoo":
         odoo_port = st.number_input("Port", value=odoo_port, min_value=1, max_value=65535)
         odoo_password = st.text_input("Mot de passe", type="password", value=odoo_password)
     
-    if st.button("🔌 Se connecter et récupérer les articles", type="primary"):
+    invoice_scope = st.checkbox(
+        "Récupérer seulement les articles de la facture",
+        help="Connexion sans téléchargement du catalogue : les articles de chaque facture sont lus dans Odoo au traitement. Les suggestions d'articles ne sont alors pas calculées.",
+    )
+
+    col_connect, col_refresh = st.columns(2)
+    with col_connect:
+        connect_clicked = st.button("🔌 Se connecter et récupérer les articles", type="primary")
+    with col_refresh:
+        refresh_clicked = st.button("🔄 Retélécharger le catalogue", help="Ignore le catalogue conservé en cache")
+
+    cache_age = catalog_cache.age(catalog_cache_key(odoo_url, odoo_port, odoo_database))
+    if cache_age is not None:
+        st.caption(f"Catalogue en cache, téléchargé il y a {int(cache_age // 60)} min")
+
+    if connect_clicked and invoice_scope:
+        with st.spinner("Connexion à Odoo..."):
+            connected = odoo_connector.connect(odoo_url, odoo_port, odoo_database, odoo_username, odoo_password)
+        if connected:
+            st.success("✅ Connecté à Odoo : les articles seront récupérés pour chaque facture")
+            st.session_state['df_articles'] = None
+            st.session_state['articles_source'] = 'odoo_facture'
+            st.session_state['odoo_connection'] = {
+                'url': odoo_url,
+                'port': odoo_port,
+                'database': odoo_database,
+                'username': odoo_username,
+                'password': odoo_password,
+            }
+        else:
+            st.error("❌ Échec de la connexion à Odoo")
+
+    elif connect_clicked or refresh_clicked:
+        if catalog_warmup is not None and catalog_warmup.is_alive():
+            with st.spinner("Téléchargement du catalogue en cours au démarrage..."):
+                catalog_warmup.join()
         with st.spinner("Connexion à Odoo et récupération des articles..."):
-            df_articles = get_odoo_articles(
-                odoo_connector,
-                odoo_url,
-                odoo_port,
-                odoo_database,
-                odoo_username,
-                odoo_password
-            )
+            progress_bar = st.progress(0.0, text="Connexion à Odoo...")
+
+            def show_catalog_progress(event):
+                if event.level == 'progress':
+                    progress_bar.progress(event.data['done'] / event.data['total'], text=event.message)
+
+            with odoo_connector.events.subscribed(show_catalog_progress):
+                df_articles = get_odoo_articles(
+                    odoo_connector,
+                    odoo_url,
+                    odoo_port,
+                    odoo_database,
+                    odoo_username,
+                    odoo_password,
+                    refresh=refresh_clicked,
+                )
+            progress_bar.empty()
             
             if df_articles is not None:
                 st.success(f"✅ {len(df_articles)} articles récupérés depuis Odoo")
@@ -176,78 +327,67 @@ with col2:
 # =============================================================================
 # Traitement principal
 # =============================================================================
-def main_processing(pdf_file, df_articles, excel_file, ref_commande, id_fourni):
-    """Fonction principale de traitement"""
-    temp_pdf_path = None
-    
-    try:
-        # Sauvegarde temporaire du PDF
-        temp_pdf_path = save_uploaded_file(pdf_file)
-        
-        # Extraction des tableaux du PDF
-        with st.spinner("Extraction des tableaux du PDF..."):
-            try:
-                df_list = pdf_processor.extract_tables_from_pdf(temp_pdf_path)
-                st.success("✅ Extraction PDF terminée")
-            except Exception as e:
-                st.error(f"❌ Échec de l'extraction PDF: {str(e)}")
-                return None, None, None, None, None
-        
-        # Concaténation et normalisation des DataFrames (traitement des colonnes fusionnées)
-        with st.spinner("Normalisation et concaténation des données..."):
-            df_raw = data_processor.concatenate_dataframes(df_list)
-                
-        # Nettoyage des données
-        with st.spinner("Nettoyage des données..."):
-            df_clean = data_processor.clean_dataframe(df_raw)
-        
-        # Fusion avec les articles
-        with st.spinner("Fusion avec les articles..."):
-            df_processed, df_unlinked_rl, df_unlinked_od = data_processor.merge_with_articles(
-                df_clean, df_articles, excel_file
-            )
-        
-        # Préparation du fichier d'import
-        with st.spinner("Préparation du fichier d'import..."):
-            df_import = data_processor.prepare_import_file(df_processed, ref_commande, id_fourni)
-        
-        return df_processed, df_unlinked_rl, df_unlinked_od, df_import, pdf_file.name[:-4]
-    
-    except Exception as e:
-        import traceback
-        st.error(f"Erreur lors du traitement : {str(e)}")
-        st.code(traceback.format_exc())
-        return None, None, None, None, None
-    
-    finally:
-        # Nettoyage du fichier temporaire
-        if temp_pdf_path:
-            cleanup_temp_file(temp_pdf_path)
-
 # Bouton de traitement
 if st.button("Traiter les fichiers", type="primary"):
     # Vérifier que les articles sont disponibles
-    if 'df_articles' not in st.session_state or st.session_state['df_articles'] is None:
+    invoice_scoped = st.session_state.get('articles_source') == 'odoo_facture'
+    if not invoice_scoped and st.session_state.get('df_articles') is None:
         st.error("❌ Veuillez d'abord récupérer les articles (via Odoo ou CSV)")
     elif pdf_file is None or excel_file is None:
         st.warning("⚠️ Veuillez uploader le PDF et le fichier de correspondance")
     else:
-        df_processed, df_unlinked_rl, df_unlinked_od, df_import, pdf_name = main_processing(
-            pdf_file, st.session_state['df_articles'], excel_file, ref_commande, id_fourni
+        profiler = StageProfiler(
+            config.PROFILE_LOG_PATH,
+            trace_memory=config.PROFILE_TRACE_MEMORY,
+            context={'facture': pdf_file.name},
+        )
+        # Un bus d'événements par traitement : les messages restent dans la session
+        events = EventBus()
+        events.subscribe(show_event)
+        pipeline = InvoicePipeline(
+            events,
+            extraction_cache=extraction_cache,
+            correspondance_cache=correspondance_cache,
+            pdf_processor=pdf_processor,
+            file_exporter=file_exporter,
         )
 
-        if df_processed is not None:
+        results = None
+        with st.status("Traitement de la facture...", expanded=True) as status:
+            def show_progress(event):
+                if event.level == 'progress':
+                    status.update(label=event.message)
+
+            events.subscribe(show_progress)
+            try:
+                articles_data = st.session_state.get('df_articles')
+                if invoice_scoped:
+                    # Articles lus dans Odoo pour les seuls noms de la facture
+                    if not odoo_connector.connected:
+                        odoo_connector.connect(**st.session_state['odoo_connection'])
+                    articles_data = odoo_connector.get_catalog_for_names
+                results = pipeline.run(
+                    pdf_file,
+                    articles_data,
+                    excel_file,
+                    ref_commande,
+                    id_fourni,
+                    profiler=profiler,
+                )
+                status.update(label="Traitement terminé", state="complete", expanded=False)
+            except Exception as e:
+                import traceback
+                status.update(label="Échec du traitement", state="error")
+                st.error(f"Erreur lors du traitement : {str(e)}")
+                st.code(traceback.format_exc())
+            finally:
+                # tracemalloc est global au serveur : libéré dès la fin du traitement
+                profiler.close()
+
+        if results is not None:
             st.session_state.pop('price_update_preview', None)
             st.session_state.pop('created_purchase_order', None)
-            st.session_state['processing_results'] = {
-                'df_processed': df_processed,
-                'df_unlinked_rl': df_unlinked_rl,
-                'df_unlinked_od': df_unlinked_od,
-                'df_import': df_import,
-                'pdf_name': pdf_name,
-                'ref_commande': ref_commande,
-                'id_fourni': id_fourni,
-            }
+            st.session_state['processing_results'] = results
             st.success("Traitement terminé avec succès !")
 
 if 'processing_results' in st.session_state:
@@ -256,11 +396,12 @@ if 'processing_results' in st.session_state:
     df_unlinked_rl = results['df_unlinked_rl']
     df_unlinked_od = results['df_unlinked_od']
     df_import = results['df_import']
+    df_suggestions = results['df_suggestions']
     pdf_name = results['pdf_name']
 
     # Affichage des résultats
     st.header("3. Résultats")
-    tab1, tab2, tab3, tab4 = st.tabs(["Commandes traitées", "Articles non liés (RL)", "Articles non liés (ODOO)", "Fichier à importer"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Commandes traitées", "Articles non liés (RL)", "Articles non liés (ODOO)", "Suggestions d'articles", "Fichier à importer"])
 
     with tab1:
         st.subheader("Commandes traitées")
@@ -284,12 +425,38 @@ if 'processing_results' in st.session_state:
             st.success("Aucun article non lié ODOO !")
 
     with tab4:
+        st.subheader("Suggestions d'articles ODOO")
+        if df_suggestions is None:
+            st.info("Suggestions indisponibles lorsque seuls les articles de la facture sont récupérés dans Odoo. Récupérez le catalogue complet pour les obtenir.")
+        elif not df_suggestions.empty:
+            st.dataframe(df_suggestions, hide_index=True)
+            st.caption("Articles ODOO aux noms proches des articles non liés (score de 0 à 1)")
+        else:
+            st.info("Aucune suggestion")
+
+    with tab5:
         st.subheader("Fichier à importer")
         st.dataframe(df_import)
 
+    with st.expander("⏱️ Temps et mémoire par étape"):
+        df_timings = pd.DataFrame(results['stage_timings'])
+        st.dataframe(
+            df_timings[['stage', 'wall_seconds', 'cpu_seconds', 'peak_memory_mb', 'calls']].rename(columns={
+                'stage': 'Étape',
+                'wall_seconds': 'Durée (s)',
+                'cpu_seconds': 'CPU (s)',
+                'peak_memory_mb': 'Pic mémoire (Mo)',
+                'calls': 'Appels',
+            }),
+            hide_index=True,
+        )
+        st.caption(f"Mesures enregistrées dans {config.PROFILE_LOG_PATH}")
+        if not config.PROFILE_TRACE_MEMORY:
+            st.caption("Pic mémoire non mesuré : tracemalloc ralentit tout le serveur (Config.PROFILE_TRACE_MEMORY)")
+
     # Création directe dans Odoo
     st.header("4. Création dans Odoo")
-    can_create_in_odoo = st.session_state.get('articles_source') == 'odoo'
+    can_create_in_odoo = st.session_state.get('articles_source') in ('odoo', 'odoo_facture')
     has_odoo_ids = 'Article ID Odoo' in df_processed.columns and df_processed['Article ID Odoo'].notna().all()
 
     if not can_create_in_odoo:
@@ -339,16 +506,16 @@ if 'processing_results' in st.session_state:
     # Téléchargement des fichiers
     st.header("5. Téléchargement des fichiers")
 
-    # Préparer les buffers pour les fichiers
-    excel_buffer = file_exporter.export_to_excel(df_processed, df_unlinked_rl, df_unlinked_od)
-    csv_buffer = file_exporter.export_to_csv(df_import)
+    # Fichiers générés lors du traitement
+    excel_bytes = results['excel_bytes']
+    csv_bytes = results['csv_bytes']
 
     col1, col2, col3 = st.columns(3)
 
     with col1:
         st.download_button(
             label="📥 Télécharger le fichier Excel",
-            data=excel_buffer,
+            data=excel_bytes,
             file_name=f"commandes_traitee_{pdf_name}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -356,7 +523,7 @@ if 'processing_results' in st.session_state:
     with col2:
         st.download_button(
             label="📥 Télécharger le fichier CSV",
-            data=csv_buffer,
+            data=csv_bytes,
             file_name=f"a_importer_{pdf_name}.csv",
             mime="text/csv"
         )
@@ -369,12 +536,10 @@ if 'processing_results' in st.session_state:
         zip_buffer = BytesIO()
         with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
             # Ajouter le fichier Excel
-            excel_buffer.seek(0)
-            zip_file.writestr(f"commandes_traitee_{pdf_name}.xlsx", excel_buffer.read())
+            zip_file.writestr(f"commandes_traitee_{pdf_name}.xlsx", excel_bytes)
 
             # Ajouter le fichier CSV
-            csv_buffer.seek(0)
-            zip_file.writestr(f"a_importer_{pdf_name}.csv", csv_buffer.read())
+            zip_file.writestr(f"a_importer_{pdf_name}.csv", csv_bytes)
 
         zip_buffer.seek(0)
 
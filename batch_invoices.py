@@ -0,0 +1,77 @@
+"""
+Traitement en ligne de commande d'un lot de factures Relais Local.
+
+Chaque facture produit un CSV d'import ODOO dans le dossier de sortie, et un
+rapport Excel unique regroupe les articles non lies de toutes les factures.
+
+Usage :
+    python batch_invoices.py factures/ --catalogue product.product.csv --correspondance Correspondance.xlsx
+    python batch_invoices.py "factures/2024-*/*.pdf" --catalogue catalogue.parquet \\
+        --correspondance Correspondance.xlsx --sortie imports --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+from core import BatchProcessor, Config
+
+
+def parse_args(argv=None):
+    config = Config()
+    parser = argparse.ArgumentParser(description="Traitement par lots des factures Relais Local")
+    parser.add_argument('sources', nargs='+', help="Dossiers, fichiers PDF ou motifs glob des factures")
+    parser.add_argument('--catalogue', required=True,
+                        help="Catalogue des articles : CSV product.product ou instantane Parquet d'Odoo")
+    parser.add_argument('--correspondance', required=True, help="Fichier Correspondance.xlsx")
+    parser.add_argument('--sortie', default='imports', help="Dossier des fichiers produits")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Nombre de factures traitees en parallele (defaut : nombre de CPU)")
+    parser.add_argument('--ref-commande', default='{facture}',
+                        help="Reference commande ; {facture} est remplace par le nom de la facture")
+    parser.add_argument('--id-fournisseur', default=config.ID_FOURNI_DEFAULT)
+    parser.add_argument('--sans-cache', action='store_true', help="Ne pas utiliser le cache disque des factures")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in (args.catalogue, args.correspondance):
+        if not os.path.isfile(path):
+            print(f"Fichier introuvable : {path}", file=sys.stderr)
+            return 2
+
+    pdf_paths = BatchProcessor.find_invoices(args.sources)
+    if not pdf_paths:
+        print("Aucune facture PDF trouvee", file=sys.stderr)
+        return 1
+
+    processor = BatchProcessor(
+        args.catalogue,
+        args.correspondance,
+        args.sortie,
+        workers=args.workers,
+        ref_commande=args.ref_commande,
+        id_fourni=args.id_fournisseur,
+        cache_dir=None if args.sans_cache else Config.CACHE_DIR,
+    )
+
+    def show(row):
+        if row['Statut'] == 'OK':
+            print(f"OK      {row['Facture']:<30} {row['Lignes traitées']:>6} lignes "
+                  f"(non liees RL {row['Non liés RL']}, ODOO {row['Non liés ODOO']})")
+        else:
+            print(f"ERREUR  {row['Facture']:<30} {row['Erreur']}")
+
+    start = time.perf_counter()
+    print(f"{len(pdf_paths)} facture(s), {min(processor.workers, len(pdf_paths))} processus")
+    df_summary = processor.run(pdf_paths, on_result=show)
+    failed = int((df_summary['Statut'] != 'OK').sum())
+
+    print(f"Termine en {time.perf_counter() - start:.1f} s : {len(df_summary) - failed} OK, {failed} en erreur")
+    print(f"Imports et rapport dans {os.path.abspath(args.sortie)} ({BatchProcessor.REPORT_NAME})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
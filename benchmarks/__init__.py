@@ -0,0 +1,3 @@
+"""
+Package benchmarks - Factures synthetiques et mesures de performance du traitement
+"""
@@ -0,0 +1,168 @@
+"""
+Benchmark du traitement des factures sur des factures synthetiques.
+
+Mesure, pour chaque taille de facture, l'extraction PDF, la concatenation, le
+nettoyage (DataProcessor.clean_dataframe) et la fusion avec les articles
+(DataProcessor.merge_with_articles), puis le traitement complet sans cache
+(InvoicePipeline.run, exports exclus). Les resultats sont ajoutes en JSON lines
+au fichier de sortie pour comparer les executions dans le temps.
+
+Le pic memoire est celui des allocations Python (tracemalloc) : la memoire
+allouee en interne par MuPDF n'y figure pas.
+
+Usage :
+    python -m benchmarks.run_benchmarks --pages 1 10 100 500 2000 --output bench_results.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from core import PDFProcessor, DataProcessor, InvoicePipeline, __version__
+from benchmarks.synthetic_invoice import build_invoice, build_reference_data
+
+
+DEFAULT_PAGES = [1, 10, 100, 500, 2000]
+
+
+def measure(function, repeat):
+    """
+    Mesure une fonction : meilleur temps sur `repeat` executions, puis une
+    execution supplementaire sous tracemalloc pour le pic memoire (le suivi
+    memoire ralentit le code Python, il ne doit pas fausser les temps).
+
+    Returns:
+        tuple: (resultat, secondes, pic memoire en Mo)
+    """
+    best_seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, best_seconds, peak / (1024 * 1024)
+
+
+def benchmark_invoice(pages, args):
+    """Execute toutes les etapes pour une facture de `pages` pages."""
+    pdf_processor = PDFProcessor()
+    data_processor = DataProcessor()
+    pdf_bytes, references = build_invoice(pages, lines_per_page=args.lines_per_page, seed=args.seed)
+    correspondance_excel, catalog = build_reference_data(references, seed=args.seed)
+
+    def extract():
+        return pdf_processor.extract_tables_from_pdf(
+            pdf_bytes,
+            parallel=args.parallel,
+            workers=args.workers,
+        )
+
+    def merge():
+        correspondance_excel.seek(0)
+        return data_processor.merge_with_articles(df_clean, catalog, correspondance_excel)
+
+    def pipeline():
+        return InvoicePipeline().run(pdf_bytes, catalog, correspondance_excel, name='synthetique', export=False)
+
+    df_list, extract_seconds, extract_peak = measure(extract, args.repeat)
+    line_count = sum(len(df) for df in df_list)
+    df_raw, concat_seconds, concat_peak = measure(
+        lambda: data_processor.concatenate_dataframes(df_list), args.repeat
+    )
+    df_clean, clean_seconds, clean_peak = measure(
+        lambda: data_processor.clean_dataframe(df_raw.copy()), args.repeat
+    )
+    _, merge_seconds, merge_peak = measure(merge, args.repeat)
+    _, pipeline_seconds, pipeline_peak = measure(pipeline, args.repeat)
+
+    return [
+        ('extraction', extract_seconds, extract_peak),
+        ('concatenation', concat_seconds, concat_peak),
+        ('nettoyage', clean_seconds, clean_peak),
+        ('fusion', merge_seconds, merge_peak),
+        ('pipeline', pipeline_seconds, pipeline_peak),
+    ], line_count
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du traitement des factures Relais Local")
+    parser.add_argument('--pages', type=int, nargs='+', default=DEFAULT_PAGES,
+                        help="Tailles de factures a mesurer, en pages (1 a 2000)")
+    parser.add_argument('--lines-per-page', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre d'executions chronometrees par etape")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--parallel', action='store_true', help="Extraction multi-processus")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='bench_results.jsonl', help="Fichier JSON lines de resultats")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run = {
+        'run_id': uuid.uuid4().hex[:12],
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'app_version': __version__,
+        'python': platform.python_version(),
+        'pymupdf': fitz.VersionBind,
+        'pandas': pd.__version__,
+        'parallel': args.parallel,
+        'workers': args.workers,
+    }
+
+    print(f"{'pages':>6} {'etape':<14} {'secondes':>10} {'pages/s':>10} {'lignes/s':>12} {'pic Mo':>8}")
+    with open(args.output, 'a', encoding='utf-8') as output:
+        for pages in args.pages:
+            stages, line_count = benchmark_invoice(pages, args)
+            for stage, seconds, peak_mb in stages:
+                record = {
+                    **run,
+                    'stage': stage,
+                    'pages': pages,
+                    'lines': line_count,
+                    'seconds': round(seconds, 6),
+                    'pages_per_sec': round(pages / seconds, 2) if seconds else None,
+                    'lines_per_sec': round(line_count / seconds, 2) if seconds else None,
+                    'peak_memory_mb': round(peak_mb, 3),
+                }
+                output.write(json.dumps(record) + '\n')
+                print(
+                    f"{pages:>6} {stage:<14} {seconds:>10.4f} {record['pages_per_sec'] or 0:>10.1f} "
+                    f"{record['lines_per_sec'] or 0:>12.1f} {peak_mb:>8.1f}"
+                )
+
+    print(f"Resultats ajoutes a {args.output} (run {run['run_id']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Generation de factures Relais Local synthetiques.
+
+Les mots sont places aux abscisses de PDFProcessor.COLUMN_BOUNDS, sous un
+en-tete de facture, avec le pied habituel (IBAN:, CONDITIONS, Clauses) sur
+chaque page. Pour les gros volumes, un jeu de pages distinctes est genere puis
+copie (les copies partagent polices et ressources), ce qui garde la generation
+rapide et le fichier compact jusqu'a plusieurs milliers de pages.
+"""
+import io
+import random
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from core import PDFProcessor
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 6
+LINE_HEIGHT = 9
+FIRST_LINE_Y = PDFProcessor.TABLE_TOP_Y + 12
+FOOTER_Y = 790
+FONT = fitz.Font('helv')
+
+NATURES = ['BIO', 'NAT', 'CONV', '']
+UNITS = ['U', 'KG', 'L', 'COL']
+WORDS = [
+    'POMME', 'JUS', 'FARINE', 'HUILE', 'OLIVE', 'RIZ', 'LENTILLES', 'CHOCOLAT',
+    'NOIR', 'LAIT', 'AVOINE', 'SAVON', 'MIEL', 'CAFE', 'THE', 'VERT', 'PATES',
+]
+
+
+def french_number(value, decimals=2):
+    """Formate un nombre a la francaise (virgule decimale)."""
+    return f"{value:.{decimals}f}".replace('.', ',')
+
+
+def build_invoice(pages, lines_per_page=60, seed=0, distinct_pages=20):
+    """
+    Construit une facture synthetique.
+
+    Args:
+        pages (int): Nombre de pages de la facture
+        lines_per_page (int): Nombre de lignes articles par page (60 max)
+        seed (int): Graine du generateur aleatoire
+        distinct_pages (int): Nombre de pages generees avant duplication
+
+    Returns:
+        tuple: (contenu du PDF en octets, liste des references produits utilisees)
+    """
+    rnd = random.Random(seed)
+    lines_per_page = min(lines_per_page, (FOOTER_Y - FIRST_LINE_Y) // LINE_HEIGHT - 1)
+    document = fitz.open()
+    references = []
+    distinct_pages = max(1, min(pages, distinct_pages))
+
+    for page_index in range(distinct_pages):
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        writer = fitz.TextWriter(page.rect)
+        _write_header(writer, page_index)
+        for line_index in range(lines_per_page):
+            reference = str(rnd.randint(100000, 999999))
+            references.append(reference)
+            _write_line(writer, FIRST_LINE_Y + line_index * LINE_HEIGHT, reference, rnd)
+        _write_footer(writer)
+        writer.write_text(page)
+
+    for index in range(distinct_pages, pages):
+        document.fullcopy_page(index % distinct_pages)
+    pdf_bytes = document.tobytes(garbage=3, deflate=True)
+    document.close()
+    return pdf_bytes, references * (pages // distinct_pages) + references[:(pages % distinct_pages) * lines_per_page]
+
+
+def build_reference_data(references, linked_ratio=0.9, catalog_size=2000, seed=0):
+    """
+    Construit une correspondance et un catalogue coherents avec les references.
+
+    Returns:
+        tuple: (fichier Excel de correspondance en memoire, DataFrame catalogue)
+    """
+    rnd = random.Random(seed)
+    unique_references = list(dict.fromkeys(references))
+    correspondance = pd.DataFrame([
+        {'Référence': int(reference), 'Nom ODOO': f"Article {index % catalog_size}"}
+        for index, reference in enumerate(unique_references)
+        if rnd.random() < linked_ratio
+    ])
+
+    catalog = pd.DataFrame({
+        'Article ID Odoo': range(1, catalog_size + 1),
+        'Article/ID': [f"__export__.product_product_{index}" for index in range(catalog_size)],
+        'Nom': [f"Article {index}" for index in range(catalog_size)],
+        'Fournisseurs/Unité de mesure/ID Odoo': 1,
+        'Fournisseurs/Unité de mesure/Nom affiché': 'Unité(s)',
+        'Taxes fournisseur/ID Odoo': 5,
+        'Taxes fournisseur/ID': 'l10n_fr.1_tva_acq_reduite',
+    })
+    # Quelques articles absents d'Odoo pour alimenter les "non liés ODOO"
+    catalog = catalog.sample(frac=linked_ratio, random_state=seed).sort_index()
+
+    excel_buffer = io.BytesIO()
+    correspondance.to_excel(excel_buffer, index=False)
+    excel_buffer.seek(0)
+    return excel_buffer, catalog.reset_index(drop=True)
+
+
+def _write_header(writer, page_index):
+    writer.append((40, 60), "RELAIS LOCAL - Grossiste en produits biologiques", font=FONT, fontsize=11)
+    for offset, text in enumerate([
+        "ZA des Champs, 00000 Ville",
+        "Tel : 00 00 00 00 00 - contact@example.org",
+        f"FACTURE N° F{page_index:06d}",
+        "Client : Demain Supermarche",
+    ]):
+        writer.append((40, 90 + offset * 14), text, font=FONT, fontsize=8)
+    for column, (left, _) in PDFProcessor.COLUMN_BOUNDS.items():
+        writer.append((left + 2, FIRST_LINE_Y - 8), column, font=FONT, fontsize=FONT_SIZE)
+
+
+def _write_line(writer, y, reference, rnd):
+    quantity = rnd.randint(1, 24)
+    gross_price = round(rnd.uniform(0.5, 40), 2)
+    discount = rnd.choice([0, 0, 0, 5, 10])
+    net_price = round(gross_price * (1 - discount / 100), 2)
+    values = {
+        'REF.': reference,
+        'DESIGNATION': " ".join(rnd.sample(WORDS, 3)) + f" {rnd.choice(['250G', '1KG', '1L', '75CL'])}",
+        'Nature': rnd.choice(NATURES),
+        'Marque': rnd.choice(['MARQUE', 'PRODUCTEUR', 'COOP']),
+        'NB Colis': str(rnd.randint(1, 4)),
+        'QTE': str(quantity) + rnd.choice(['', '', 'K']),
+        'UV': rnd.choice(UNITS),
+        'PU Brut': french_number(gross_price),
+        'R.%': french_number(discount) if discount else '',
+        'PU Net': french_number(net_price),
+        'Montant HT': french_number(quantity * net_price),
+        'Tva': rnd.choice(['1', '2']),
+    }
+    baseline = y + FONT_SIZE
+    for column, text in values.items():
+        if text:
+            writer.append(
+                (PDFProcessor.COLUMN_BOUNDS[column][0] + 2, baseline),
+                text,
+                font=FONT,
+                fontsize=FONT_SIZE,
+            )
+
+
+def _write_footer(writer):
+    writer.append((40, FOOTER_Y + 18), "IBAN: FR76 0000 0000 0000 0000 0000 000", font=FONT, fontsize=7)
+    writer.append((40, FOOTER_Y + 28), "CONDITIONS DE REGLEMENT : 30 jours fin de mois", font=FONT, fontsize=7)
+    writer.append((40, FOOTER_Y + 38), "Clauses de reserve de propriete applicables", font=FONT, fontsize=7)
@@ -6,13 +6,38 @@ from .pdf_processor import PDFProcessor
 from .data_processor import DataProcessor
 from .file_exporter import FileExporter
 from .odoo_connector import OdooConnector
+from .disk_cache import DiskCache
+from .instrumentation import StageProfiler
+from .correspondance_index import CorrespondanceIndex
+from .article_index import ArticleIndex
+from .events import EventBus
+from .pipeline import InvoicePipeline
+from .batch import BatchProcessor
+from .watch import InvoiceWatcher
+from .catalog_snapshot import CatalogSnapshot
+from .odoo_pool import OdooConnectionPool
+from .odoo_async import AsyncOdooClient
+from .odoo_executor import AsyncOdooExecutor, OdoorpcExecutor
 
 __all__ = [
     'Config',
     'PDFProcessor', 
     'DataProcessor',
     'FileExporter',
-    'OdooConnector'
+    'OdooConnector',
+    'DiskCache',
+    'StageProfiler',
+    'CorrespondanceIndex',
+    'ArticleIndex',
+    'EventBus',
+    'InvoicePipeline',
+    'BatchProcessor',
+    'InvoiceWatcher',
+    'CatalogSnapshot',
+    'OdooConnectionPool',
+    'AsyncOdooClient',
+    'AsyncOdooExecutor',
+    'OdoorpcExecutor'
 ]
 
 # Version du package
@@ -0,0 +1,174 @@
+"""
+Index des articles du catalogue ODOO par nom.
+
+Le catalogue (Odoo ou product.product.csv) est prepare une seule fois :
+calcul de l'Article/ID, suppression des articles sans identifiant, puis cle
+unique par nom normalise. Les lignes de facture sont ensuite resolues par
+simple lecture de l'index, sans copier ni refusionner le catalogue a chaque
+facture. Deux variantes portant le meme nom ne peuvent plus dupliquer une
+ligne de facture : la premiere est retenue et le conflit est signale.
+"""
+import os
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .article_suggester import ArticleSuggester
+from .disk_cache import content_key
+
+
+class ArticleIndex:
+    """Catalogue d'articles indexe par nom normalise."""
+
+    ARTICLE_COLUMNS = [
+        'Article/ID',
+        'Nom',
+        'Fournisseurs/Unité de mesure/Nom affiché',
+        'Taxes fournisseur/ID',
+    ]
+    OPTIONAL_COLUMNS = [
+        'Article ID Odoo',
+        'Fournisseurs/Unité de mesure/ID Odoo',
+        'Taxes fournisseur/ID Odoo',
+    ]
+    MEMORY_ENTRIES = 2
+
+    _memory = OrderedDict()
+    # Sessions Streamlit et threads partagent _memory
+    _memory_lock = threading.Lock()
+
+    def __init__(self, articles: pd.DataFrame, fingerprint: str = None):
+        self.fingerprint = fingerprint
+        articles = self._prepare_articles(articles)
+        keys = self.normalize_names(articles['Nom'])
+
+        duplicated = keys.notna() & keys.duplicated(keep=False)
+        self.conflicts = articles[duplicated].assign(**{'Nom normalisé': keys[duplicated]})
+        self.conflicts = self.conflicts.sort_values('Nom normalisé', kind='stable')
+        self.conflicts_reported = False
+
+        self.article_count = len(articles)
+        unique = keys.notna() & ~keys.duplicated(keep='first')
+        self.table = articles[unique].reset_index(drop=True)
+        self.keys = pd.Index(keys[unique])
+        self._suggester = None
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def for_catalog(cls, articles_data):
+        """
+        Retourne l'index du catalogue, reconstruit seulement si son contenu a change.
+
+        Args:
+            articles_data: DataFrame (Odoo) ou fichier CSV (chemin ou objet fichier) des articles
+
+        Returns:
+            ArticleIndex: Index partage tant que le catalogue est identique
+        """
+        if isinstance(articles_data, pd.DataFrame):
+            fingerprint = cls._dataframe_fingerprint(articles_data)
+            articles = articles_data
+        else:
+            data = cls._read_bytes(articles_data)
+            fingerprint = content_key(data, 'csv')
+            articles = None
+
+        if fingerprint is not None:
+            with cls._memory_lock:
+                index = cls._memory.get(fingerprint)
+                if index is not None:
+                    cls._memory.move_to_end(fingerprint)
+                    return index
+
+        if articles is None:
+            articles = pd.read_csv(BytesIO(data))
+
+        # Construction hors du verrou : les autres catalogues ne l'attendent pas
+        index = cls(articles, fingerprint)
+        if fingerprint is not None:
+            with cls._memory_lock:
+                cls._memory[fingerprint] = index
+                while len(cls._memory) > cls.MEMORY_ENTRIES:
+                    cls._memory.popitem(last=False)
+        return index
+
+    @staticmethod
+    def normalize_names(names: pd.Series) -> pd.Series:
+        """Nom en minuscules, sans espaces superflus, en forme Unicode NFC."""
+        return (
+            names.astype('string')
+            .str.normalize('NFC')
+            .str.strip()
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.casefold()
+        )
+
+    def resolve(self, names: pd.Series) -> pd.DataFrame:
+        """
+        Retourne les colonnes articles correspondant a chaque nom, alignees sur names.
+
+        Les noms absents du catalogue donnent une ligne vide (valeurs manquantes).
+        """
+        # Une facture repete les memes noms : seuls les noms distincts sont normalises
+        codes, uniques = pd.factorize(names)
+        positions = self.keys.get_indexer(self.normalize_names(pd.Series(uniques, dtype='string')))
+        # Code -1 (nom manquant) : dernier element, la position -1 ajoutee
+        rows = np.append(positions, -1)[codes]
+        # -1 (nom inconnu) n'existe pas dans le RangeIndex : ligne vide
+        return self.table.reindex(rows).set_axis(names.index, axis=0)
+
+    def suggester(self, min_score=0.3):
+        """Moteur de suggestions par trigrammes, construit au premier appel puis partage."""
+        if self._suggester is None or self._suggester.min_score != min_score:
+            self._suggester = ArticleSuggester(
+                self.keys, self.table[['Article/ID', 'Nom']], min_score=min_score
+            )
+        return self._suggester
+
+    def _prepare_articles(self, articles):
+        """Calcule l'Article/ID et ne garde que les articles identifiables."""
+        art = articles.copy()
+
+        # Pour les données venant d'Odoo, on utilise déjà l'ID externe
+        if 'Article/ID' not in art.columns and 'ID Externe' in art.columns:
+            art['Article/ID'] = art['ID Externe']
+        elif 'Article/ID' not in art.columns:
+            art['Article/ID'] = None
+
+        # Remplir les valeurs manquantes d'Article/ID avec ID Externe si disponible
+        if 'ID Externe' in art.columns:
+            art.loc[art['Article/ID'].isna(), 'Article/ID'] = art['ID Externe']
+
+        art = art[~art['Article/ID'].isna()]
+
+        columns = self.ARTICLE_COLUMNS + [
+            column for column in self.OPTIONAL_COLUMNS if column in art.columns
+        ]
+        return art[columns].reset_index(drop=True)
+
+    @staticmethod
+    def _dataframe_fingerprint(df):
+        try:
+            hashes = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Cellules non hachables (listes...) : pas de partage de l'index
+            return None
+        return content_key(hashes.to_numpy().tobytes(), repr(list(df.columns)))
+
+    @staticmethod
+    def _read_bytes(source):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                return file.read()
+        if hasattr(source, 'getvalue'):
+            return source.getvalue()
+        position = source.tell() if hasattr(source, 'tell') else None
+        data = source.read()
+        if position is not None:
+            source.seek(position)
+        return data
@@ -0,0 +1,242 @@
+"""
+Traitement par lots d'un dossier de factures.
+
+Les factures sont traitees en parallele par un pool de processus. Chaque
+processus charge une seule fois, a son demarrage, le catalogue d'articles et
+la correspondance (index ArticleIndex et CorrespondanceIndex), puis enchaine
+les factures avec le meme InvoicePipeline. Le processus principal ecrit un
+CSV d'import par facture et un rapport Excel unique des articles non lies.
+"""
+import glob
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .article_index import ArticleIndex
+from .config import Config
+from .correspondance_index import CorrespondanceIndex
+from .disk_cache import DiskCache
+from .file_exporter import FileExporter
+from .pipeline import InvoicePipeline
+
+
+# Etat d'un processus de traitement, initialise par _init_worker
+_worker = {}
+
+
+def load_catalog(path) -> pd.DataFrame:
+    """
+    Charge un catalogue d'articles : export CSV product.product ou instantane
+    Parquet d'un catalogue Odoo (voir DiskCache).
+    """
+    if str(path).lower().endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _init_worker(catalog_path, correspondance_path, cache_dir):
+    """Charge catalogue, correspondance et pipeline une fois par processus."""
+    correspondance_cache = extraction_cache = None
+    if cache_dir:
+        correspondance_cache = DiskCache(
+            os.path.join(cache_dir, 'correspondance'), Config.CORRESPONDANCE_CACHE_MAX_BYTES
+        )
+        extraction_cache = DiskCache(
+            os.path.join(cache_dir, 'factures'), Config.EXTRACTION_CACHE_MAX_BYTES
+        )
+
+    _worker['articles'] = ArticleIndex.for_catalog(load_catalog(catalog_path))
+    _worker['correspondance'] = CorrespondanceIndex.load(correspondance_path, correspondance_cache)
+    _worker['pipeline'] = InvoicePipeline(
+        extraction_cache=extraction_cache,
+        correspondance_cache=correspondance_cache,
+    )
+
+
+def _process_invoice(pdf_path, ref_commande, id_fourni):
+    """Traite une facture dans un processus initialise par _init_worker."""
+    pipeline = _worker['pipeline']
+    name = InvoicePipeline.invoice_name(pdf_path)
+    results = pipeline.run(
+        pdf_path,
+        _worker['articles'],
+        _worker['correspondance'],
+        ref_commande.format(facture=name),
+        id_fourni,
+        name=name,
+        export=False,
+    )
+    # Seules les donnees utiles au processus principal sont renvoyees
+    return {
+        key: results[key]
+        for key in ('pdf_name', 'df_processed', 'df_unlinked_rl', 'df_unlinked_od',
+                    'df_import', 'df_suggestions', 'stage_timings')
+    }
+
+
+class BatchProcessor:
+    """Traite un ensemble de factures PDF en parallele."""
+
+    REPORT_NAME = 'articles_non_lies.xlsx'
+    SUMMARY_COLUMNS = [
+        'Facture', 'Fichier', 'Statut', 'Lignes traitées', 'Non liés RL',
+        'Non liés ODOO', "Fichier d'import", 'Erreur',
+    ]
+
+    def __init__(self, catalog_path, correspondance_path, output_dir, workers=None,
+                 ref_commande='{facture}', id_fourni=None, cache_dir=None):
+        """
+        Args:
+            catalog_path (str): CSV product.product ou instantane Parquet du catalogue Odoo
+            correspondance_path (str): Fichier Correspondance.xlsx
+            output_dir (str): Dossier des CSV d'import et du rapport
+            workers (int): Nombre de processus (Config.PDF_PARALLEL_WORKERS ou nombre de CPU)
+            ref_commande (str): Reference commande, '{facture}' etant remplace par le nom de la facture
+            id_fourni (str): ID externe du fournisseur (Config par defaut)
+            cache_dir (str): Dossier des caches disque, None pour ne pas en utiliser
+        """
+        self.config = Config()
+        self.catalog_path = catalog_path
+        self.correspondance_path = correspondance_path
+        self.output_dir = output_dir
+        self.workers = workers or self.config.PDF_PARALLEL_WORKERS or os.cpu_count() or 1
+        self.ref_commande = ref_commande
+        self.id_fourni = id_fourni or self.config.ID_FOURNI_DEFAULT
+        self.cache_dir = cache_dir
+        self.file_exporter = FileExporter()
+
+    @staticmethod
+    def find_invoices(sources):
+        """
+        Liste les PDF a traiter depuis des dossiers, fichiers ou motifs glob.
+
+        Returns:
+            list: Chemins des PDF, sans doublon, tries
+        """
+        paths = set()
+        for source in sources:
+            if os.path.isdir(source):
+                candidates = glob.glob(os.path.join(source, '*'))
+            else:
+                candidates = glob.glob(source, recursive=True)
+            paths.update(
+                os.path.abspath(path) for path in candidates
+                if path.lower().endswith('.pdf') and os.path.isfile(path)
+            )
+        return sorted(paths)
+
+    def run(self, pdf_paths, on_result=None):
+        """
+        Traite les factures et ecrit les fichiers de sortie.
+
+        Args:
+            pdf_paths (list): Chemins des factures
+            on_result: Fonction appelee avec chaque ligne du resume des qu'une facture est traitee
+
+        Returns:
+            pd.DataFrame: Resume par facture (statut, lignes, fichier d'import, erreur)
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        import_names = self.import_names(pdf_paths)
+        summary, unlinked_rl, unlinked_od, suggestions = [], [], [], []
+
+        for pdf_path, results, error in self._iter_results(pdf_paths):
+            row = dict.fromkeys(self.SUMMARY_COLUMNS)
+            row.update({
+                'Facture': InvoicePipeline.invoice_name(pdf_path),
+                'Fichier': pdf_path,
+                'Statut': 'OK' if error is None else 'Erreur',
+                'Erreur': error,
+            })
+            if results is not None:
+                import_path = os.path.join(self.output_dir, import_names[pdf_path])
+                with open(import_path, 'wb') as import_file:
+                    import_file.write(self.file_exporter.export_to_csv(results['df_import']).getvalue())
+
+                row.update({
+                    'Lignes traitées': len(results['df_processed']),
+                    'Non liés RL': len(results['df_unlinked_rl']),
+                    'Non liés ODOO': len(results['df_unlinked_od']),
+                    "Fichier d'import": import_path,
+                })
+                for collected, key in [
+                    (unlinked_rl, 'df_unlinked_rl'),
+                    (unlinked_od, 'df_unlinked_od'),
+                    (suggestions, 'df_suggestions'),
+                ]:
+                    if results[key] is not None and not results[key].empty:
+                        collected.append(results[key].assign(Facture=row['Facture']))
+
+            summary.append(row)
+            if on_result is not None:
+                on_result(row)
+
+        df_summary = pd.DataFrame(summary, columns=self.SUMMARY_COLUMNS).sort_values('Facture', kind='stable', ignore_index=True)
+        report = self.file_exporter.export_unlinked_report(
+            df_summary,
+            self._concat(unlinked_rl),
+            self._concat(unlinked_od),
+            self._concat(suggestions),
+        )
+        with open(os.path.join(self.output_dir, self.REPORT_NAME), 'wb') as report_file:
+            report_file.write(report.getvalue())
+        return df_summary
+
+    @staticmethod
+    def import_names(pdf_paths):
+        """
+        Nom du CSV d'import de chaque facture : '<facture>.csv', ou, pour des
+        factures de meme nom venant de dossiers differents,
+        '<facture>_<empreinte du chemin>.csv' afin qu'aucune n'ecrase l'autre.
+
+        Returns:
+            dict: Chemin du PDF -> nom du fichier CSV
+        """
+        names = {path: InvoicePipeline.invoice_name(path) for path in pdf_paths}
+        # Comparaison sans casse : certains systemes de fichiers ne la distinguent pas
+        counts = Counter(name.casefold() for name in names.values())
+        import_names = {}
+        for path, name in names.items():
+            if counts[name.casefold()] > 1:
+                path_hash = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+                name = f"{name}_{path_hash[:8]}"
+            import_names[path] = f"{name}.csv"
+        return import_names
+
+    def _iter_results(self, pdf_paths):
+        """Produit (chemin, resultats, erreur) dans l'ordre de fin de traitement."""
+        initargs = (self.catalog_path, self.correspondance_path, self.cache_dir)
+        args = (self.ref_commande, self.id_fourni)
+
+        if self.workers <= 1 or len(pdf_paths) <= 1:
+            # Un seul processus : traitement sur place, sans pool
+            _init_worker(*initargs)
+            for pdf_path in pdf_paths:
+                try:
+                    yield pdf_path, _process_invoice(pdf_path, *args), None
+                except Exception as e:
+                    yield pdf_path, None, str(e)
+            return
+
+        workers = min(self.workers, len(pdf_paths))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            futures = {
+                executor.submit(_process_invoice, pdf_path, *args): pdf_path
+                for pdf_path in pdf_paths
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, str(e)
+
+    @staticmethod
+    def _concat(frames):
+        if not frames:
+            return pd.DataFrame(columns=['Facture'])
+        df = pd.concat(frames, ignore_index=True)
+        # La facture d'origine en premiere colonne
+        return df[['Facture'] + [column for column in df.columns if column != 'Facture']]
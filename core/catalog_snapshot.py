@@ -0,0 +1,137 @@
+"""
+Instantane local du catalogue Odoo (SQLite).
+
+Les tables brutes lues par OdooConnector.fetch_catalog_tables (variantes,
+ID externes, lignes fournisseurs, modeles, ID externes des taxes) sont
+conservees enregistrement par enregistrement, avec la date de derniere
+modification (write_date) la plus recente vue : le filigrane. Une
+synchronisation ne telecharge ensuite que les enregistrements modifies depuis
+ce filigrane, et retire ceux qui ont disparu ou ont ete archives.
+"""
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+
+class CatalogSnapshot:
+    """Tables brutes du catalogue Odoo, stockees dans une base SQLite."""
+
+    TABLES = ('products', 'external_ids', 'suppliers', 'templates', 'tax_external_ids')
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.fspath(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS enregistrements (
+                nom_table TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                donnees TEXT NOT NULL,
+                PRIMARY KEY (nom_table, id)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                cle TEXT PRIMARY KEY,
+                valeur TEXT
+            );
+            """
+        )
+        self.connection.commit()
+
+    @property
+    def watermark(self):
+        """write_date la plus recente deja synchronisee (texte 'AAAA-MM-JJ HH:MM:SS')."""
+        return self._get_meta('watermark')
+
+    def is_ready(self, signature: str) -> bool:
+        """True si l'instantane est complet et construit avec les memes requetes."""
+        return self.watermark is not None and self._get_meta('signature') == signature
+
+    def replace_all(self, tables: dict, signature: str):
+        """Remplace tout l'instantane par des tables completes."""
+        with self.connection:
+            self.connection.execute("DELETE FROM enregistrements")
+            self.connection.execute("DELETE FROM meta")
+            for name in self.TABLES:
+                self._insert(name, self._records(tables.get(name)))
+            self._set_meta('signature', signature)
+            self._set_meta('watermark', self._max_write_date(tables.values()) or '1970-01-01 00:00:00')
+
+    def apply_changes(self, changes: dict, retained_ids: dict, replaced: dict = None):
+        """
+        Applique une synchronisation incrementale, en une transaction.
+
+        Args:
+            changes (dict): Table -> enregistrements modifies (liste de dicts Odoo)
+            retained_ids (dict): Table -> ids encore presents dans Odoo ; les autres sont retires
+            replaced (dict): Table -> enregistrements remplacant entierement la table
+        """
+        replaced = replaced or {}
+        with self.connection:
+            for name, records in changes.items():
+                self._insert(name, records)
+            for name, ids in retained_ids.items():
+                removed = self.record_ids(name) - set(ids)
+                self.connection.executemany(
+                    "DELETE FROM enregistrements WHERE nom_table = ? AND id = ?",
+                    [(name, record_id) for record_id in removed],
+                )
+            for name, records in replaced.items():
+                self.connection.execute("DELETE FROM enregistrements WHERE nom_table = ?", (name,))
+                self._insert(name, records)
+
+            watermark = self._max_write_date([*changes.values(), *replaced.values()])
+            if watermark and watermark > (self.watermark or ''):
+                self._set_meta('watermark', watermark)
+
+    def record_ids(self, name: str) -> set:
+        rows = self.connection.execute("SELECT id FROM enregistrements WHERE nom_table = ?", (name,))
+        return {row[0] for row in rows}
+
+    def load_tables(self) -> dict:
+        """Relit les tables de l'instantane, au format de fetch_catalog_tables."""
+        tables = {}
+        for name in self.TABLES:
+            rows = self.connection.execute(
+                "SELECT donnees FROM enregistrements WHERE nom_table = ? ORDER BY id", (name,)
+            )
+            tables[name] = pd.DataFrame([json.loads(row[0]) for row in rows])
+        return tables
+
+    def close(self):
+        self.connection.close()
+
+    def _insert(self, name, records):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO enregistrements VALUES (?, ?, ?)",
+            [(name, int(record['id']), json.dumps(record, default=str)) for record in records],
+        )
+
+    @staticmethod
+    def _records(table):
+        if table is None:
+            return []
+        if isinstance(table, pd.DataFrame):
+            return table.to_dict('records')
+        return list(table)
+
+    def _max_write_date(self, tables):
+        dates = []
+        for table in tables:
+            if isinstance(table, pd.DataFrame):
+                if 'write_date' in table.columns and table['write_date'].notna().any():
+                    dates.append(table['write_date'].dropna().max())
+            elif table:
+                dates.extend(record['write_date'] for record in table if record.get('write_date'))
+        return max(dates) if dates else None
+
+    def _get_meta(self, key):
+        row = self.connection.execute("SELECT valeur FROM meta WHERE cle = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
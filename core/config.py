@@ -1,6 +1,7 @@
 """
 Configuration de l'application
 """
+import os
 
 class Config:
     """Paramètres de configuration par défaut"""
@@ -11,6 +12,50 @@ class Config:
     # Colonnes attendues dans le PDF
     PDF_COLUMNS = ['REF.', 'DESIGNATION', 'Nature', 'QTE', 'UV', 'PU Brut', 'R.%', 'PU Net', 'Montant HT']
     FLOAT_COLUMNS = ['PU Brut', 'R.%', 'PU Net', 'Montant HT']
+
+    # Extraction PDF en parallele (mode optionnel)
+    PDF_PARALLEL_WORKERS = None  # None : nombre de processeurs de la machine
+    PDF_PARALLEL_MIN_PAGES = 40  # En dessous, on reste mono-processus
+    PDF_FAST_EXTRACTION = True  # Texte extrait uniquement dans la zone du tableau
+
+    # Cache disque (lignes de factures deja analysees)
+    CACHE_DIR = os.environ.get(
+        'RELAIS_LOCAL_CACHE_DIR',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache'),
+    )
+    EXTRACTION_CACHE_MAX_BYTES = 200 * 1024 * 1024
+    CORRESPONDANCE_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+    # Mesures de temps et de memoire par etape du traitement (JSON lines)
+    PROFILE_LOG_PATH = os.environ.get(
+        'RELAIS_LOCAL_PROFILE_LOG',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'etapes.jsonl'),
+    )
+    PROFILE_TRACE_MEMORY = False  # Pic memoire (tracemalloc, tout le processus) : ralentit chaque allocation
+
+    # Suggestions d'articles ODOO pour les lignes non liees (trigrammes)
+    SUGGESTION_TOP_K = 3
+    SUGGESTION_MIN_SCORE = 0.3
+
+    # Telechargement du catalogue Odoo : ids par requete et requetes simultanees
+    ODOO_CHUNK_SIZE = 2000
+    ODOO_MAX_WORKERS = 4
+    ODOO_WRITE_BATCH_SIZE = 200  # Ids par appel write groupe (mise a jour des prix)
+    ODOO_ASYNC_RPC = True  # Lectures independantes en parallele via AsyncOdooClient (aiohttp)
+    ODOO_SYNC_OVERLAP_SECONDS = 300  # Synchronisation incrementale : relecture avant le filigrane (transactions longues)
+
+    # Pool de connexions Odoo authentifiees (application Streamlit)
+    ODOO_POOL_IDLE_SECONDS = 900  # Connexion libre fermee apres ce delai
+    ODOO_POOL_MAX_IDLE = 4  # Connexions libres par serveur, base et utilisateur
+
+    # Catalogue Odoo conserve sur disque (Parquet), par serveur et base de donnees
+    ODOO_CATALOG_CACHE_TTL = 3600  # Secondes avant un nouveau telechargement
+    ODOO_CATALOG_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+    # Surveillance d'un dossier de factures (watch_invoices.py)
+    WATCH_POLL_SECONDS = 5
+    WATCH_SETTLE_SECONDS = 2  # Fichier inchange depuis ce delai : copie terminee
+    WATCH_RETRY_SECONDS = 600  # Facture en erreur retentee apres ce delai si les sources n'ont pas change
     
     # Colonnes pour l'export
     EXPORT_COLUMNS = [
@@ -0,0 +1,110 @@
+"""
+Index de correspondance Référence Relais Local -> Nom ODOO.
+
+La lecture de Correspondance.xlsx par openpyxl coute plus cher que toute
+l'extraction PDF. Le fichier est donc analyse une seule fois par contenu :
+l'index est retrouve par le hash de ses octets, d'abord en memoire (meme
+processus), puis dans le cache disque (entre sessions et redemarrages).
+"""
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from .disk_cache import content_key
+
+
+class CorrespondanceIndex:
+    """Table de hachage Référence -> Nom ODOO issue de Correspondance.xlsx."""
+
+    # A incrementer si la preparation de la correspondance change
+    VERSION = 1
+    MEMORY_ENTRIES = 4
+
+    _memory = OrderedDict()
+    # Sessions Streamlit et threads partagent _memory
+    _memory_lock = threading.Lock()
+
+    def __init__(self, df_correspondance: pd.DataFrame, content_hash: str = None):
+        self.df = df_correspondance
+        self.content_hash = content_hash
+        valid = self.df['Référence'].notna()
+        self.mapping = dict(zip(self.df.loc[valid, 'Référence'], self.df.loc[valid, 'Nom ODOO']))
+
+    def __len__(self):
+        return len(self.df)
+
+    @classmethod
+    def load(cls, source, cache=None):
+        """
+        Retourne l'index du fichier de correspondance, en le reconstruisant
+        seulement si son contenu n'a jamais ete vu.
+
+        Args:
+            source: Chemin, octets ou objet fichier (UploadedFile Streamlit) du fichier Excel
+            cache (DiskCache): Cache disque optionnel des correspondances analysees
+
+        Returns:
+            CorrespondanceIndex: Index de la correspondance
+        """
+        data = cls._read_bytes(source)
+        key = content_key(data, 'correspondance', str(cls.VERSION))
+
+        with cls._memory_lock:
+            index = cls._memory.get(key)
+            if index is not None:
+                cls._memory.move_to_end(key)
+                return index
+
+        df_correspondance = cache.get(key) if cache is not None else None
+        if df_correspondance is None:
+            df_correspondance = cls._parse_excel(data)
+            if cache is not None:
+                cache.put(key, df_correspondance)
+
+        index = cls(df_correspondance, key)
+        with cls._memory_lock:
+            cls._memory[key] = index
+            while len(cls._memory) > cls.MEMORY_ENTRIES:
+                cls._memory.popitem(last=False)
+        return index
+
+    def annotate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ajoute les colonnes 'Référence' et 'Nom ODOO' aux lignes de facture.
+
+        Equivalent a une jointure gauche sur 'REF.' (index remis a zero, colonne
+        'Référence' vide si la reference est absente), par simple lecture de
+        la table de hachage.
+        """
+        df_annotated = df.reset_index(drop=True)
+        refs = df_annotated['REF.'].astype('string')
+        found = refs.isin(self.mapping.keys())
+        df_annotated['Référence'] = refs.where(found)
+        df_annotated['Nom ODOO'] = refs.map(self.mapping).astype('string')
+        return df_annotated
+
+    @staticmethod
+    def _parse_excel(data) -> pd.DataFrame:
+        crpd = pd.read_excel(BytesIO(data))
+        crpd = crpd.drop_duplicates(subset='Référence', keep='first')
+        crpd['Référence'] = crpd['Référence'].astype('string')
+        crpd['Nom ODOO'] = crpd['Nom ODOO'].astype('string')
+        return crpd[['Référence', 'Nom ODOO']].reset_index(drop=True)
+
+    @staticmethod
+    def _read_bytes(source):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                return file.read()
+        if hasattr(source, 'getvalue'):
+            return source.getvalue()
+        if hasattr(source, 'read'):
+            position = source.tell() if hasattr(source, 'tell') else None
+            data = source.read()
+            if position is not None:
+                source.seek(position)
+            return data
+        return bytes(source)
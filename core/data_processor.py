@@ -2,17 +2,33 @@
 """
 Traitement et transformation des données
 """
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import datetime
-import streamlit as st
 import re
 from .config import Config
+from .correspondance_index import CorrespondanceIndex
+from .article_index import ArticleIndex
+from .events import EventBus
 
 class DataProcessor:
     """Classe pour le traitement des données"""
     
-    def __init__(self):
+    # Texte parasite retiré des quantités avant conversion (unité collée, "G virgule")
+    QUANTITY_NOISE = ('K', 'G virgule')
+    # Colonnes texte à faible cardinalité stockées en catégories
+    CATEGORY_COLUMNS = ['Nature', 'UV']
+    # Chaînes compactes (Arrow) pour les références
+    REF_DTYPE = pd.StringDtype('pyarrow')
+    
+    def __init__(self, correspondance_cache=None, events=None):
         self.config = Config()
+        # Cache disque optionnel des fichiers de correspondance déjà analysés
+        self.correspondance_cache = correspondance_cache
+        # Messages de progression publiés pour l'interface (ou journalisés)
+        self.events = events or EventBus()
     
     def _handle_merged_designation_nature(self, df):
         """
@@ -80,6 +96,52 @@ class DataProcessor:
         
         return df_concatenated
     
+    def concatenate_clean_batches(self, batches):
+        """
+        Concatène des lots nettoyés (voir iter_clean_batches) en conservant les catégories
+        Les catégories de chaque lot sont d'abord alignées sur leur union : sans cela,
+        pd.concat repasserait les colonnes 'Nature' et 'UV' en objets.
+        
+        Args:
+            batches (list): Liste de DataFrames nettoyés
+            
+        Returns:
+            pd.DataFrame: DataFrame nettoyé complet
+        """
+        for col in self.CATEGORY_COLUMNS:
+            categories = pd.Index([])
+            for batch in batches:
+                if col in batch.columns and isinstance(batch[col].dtype, pd.CategoricalDtype):
+                    categories = categories.union(batch[col].cat.categories, sort=False)
+            for batch in batches:
+                if col in batch.columns and isinstance(batch[col].dtype, pd.CategoricalDtype):
+                    batch[col] = batch[col].cat.set_categories(categories)
+        
+        return pd.concat(batches)
+    
+    def iter_clean_batches(self, df_iter):
+        """
+        Normalise et nettoie les DataFrames de pages au fil de l'eau
+        Chaque page est traitée seule : la mémoire utilisée reste celle d'une page,
+        au lieu des copies successives de concatenate_dataframes puis clean_dataframe.
+        L'index est décalé d'une page à l'autre pour rester unique, comme après concaténation.
+        
+        Args:
+            df_iter: Itérable de DataFrames bruts (voir PDFProcessor.iter_tables_from_pdf)
+            
+        Yields:
+            pd.DataFrame: Lignes nettoyées et typées de chaque page
+        """
+        offset = 0
+        for df in df_iter:
+            df = self._handle_merged_designation_nature(df)
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            
+            df_clean = self.clean_dataframe(df)
+            if not df_clean.empty:
+                yield df_clean
+    
     def clean_dataframe(self, df):
         """
         Nettoie et transforme le DataFrame extrait du PDF
@@ -120,32 +182,39 @@ class DataProcessor:
         """Convertit les types de données des colonnes"""
         # Colonnes float
         for col in self.config.FLOAT_COLUMNS:
-            df[col] = (
-                df[col]
-                .astype('string')
-                .str.replace(',', '.', regex=False)
-                .replace('', '0')
-                .fillna('0')
-                .astype('float64')
-            )
+            df[col] = self._parse_french_numbers(df[col])
         
         # Traitement spécifique pour la quantité
-        df['QTE'] = (
-            df['QTE']
-            .astype('string')
-            .str.replace('K', '', regex=False)
-            .str.replace('G virgule', '', regex=False)
-            .str.replace(',', '.', regex=False)
-            .replace('', '0')
-            .fillna('0')
-            .astype('float64')
-        )
+        df['QTE'] = self._parse_french_numbers(df['QTE'], noise=self.QUANTITY_NOISE)
         
         # Traitement de la référence
-        df['REF.'] = df['REF.'].astype('string').str.replace('.0', '', regex=False)
+        df['REF.'] = df['REF.'].astype(self.REF_DTYPE).str.replace('.0', '', regex=False)
+        
+        for col in self.CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
         
         return df
     
+    def _parse_french_numbers(self, column, noise=()):
+        """
+        Convertit une colonne de nombres à la française en float64
+        La colonne est passée une seule fois en tableau Arrow, puis traitée par les
+        noyaux compilés de pyarrow.compute (retrait du texte parasite, virgule
+        décimale, espaces en bordure, conversion), sans Series pandas intermédiaire à chaque étape.
+        Les valeurs vides ou manquantes valent 0 ; une valeur non numérique lève
+        une ValueError (pa.ArrowInvalid), comme astype('float64').
+        """
+        values = pa.array(column.astype(self.REF_DTYPE))
+        for token in noise:
+            values = pc.replace_substring(values, token, '')
+        values = pc.replace_substring(values, ',', '.')
+        # Le retrait du texte parasite laisse des espaces ("12 K" -> "12 ")
+        values = pc.utf8_trim_whitespace(values)
+        values = pc.if_else(pc.equal(values, ''), pa.scalar(None, pa.string()), values)
+        numbers = pc.fill_null(pc.cast(values, pa.float64()), 0.0)
+        
+        return pd.Series(numbers.to_numpy(), index=column.index, name=column.name)
+    
     def _recalculate_quantity(self, df):
         """Recalcule la quantité si nécessaire"""
         df['QTE 2'] = df['Montant HT'] / df['PU Net']
@@ -158,85 +227,145 @@ class DataProcessor:
         
         Args:
             df (pd.DataFrame): DataFrame des commandes
-            articles_data: DataFrame ou fichier CSV des articles
+            articles_data: DataFrame ou fichier CSV des articles, ou ArticleIndex déjà construit
             correspondance_excel: Fichier Excel de correspondance (file object ou path)
+                ou CorrespondanceIndex déjà chargé
             
         Returns:
             tuple: (df_merged, df_unlinked_rl, df_unlinked_od) - Données fusionnées et articles non liés
         """
-        # Gestion des articles : soit un DataFrame (venant d'Odoo), soit un CSV
-        if isinstance(articles_data, pd.DataFrame):
-            art = articles_data.copy()
-        else:
-            art = pd.read_csv(articles_data)
-        
-        # Import du fichier de correspondance
-        crpd = pd.read_excel(correspondance_excel)
-        
-        # Nettoyage des données articles
-        # Pour les données venant d'Odoo, on utilise déjà l'ID externe
-        if 'Article/ID' not in art.columns and 'ID Externe' in art.columns:
-            art['Article/ID'] = art['ID Externe']
-        elif 'Article/ID' not in art.columns:
-            # Si aucune des deux colonnes n'existe, on essaie de la créer
-            art['Article/ID'] = None
-        
-        # Remplir les valeurs manquantes d'Article/ID avec ID Externe si disponible
-        if 'ID Externe' in art.columns:
-            art.loc[art['Article/ID'].isna(), 'Article/ID'] = art['ID Externe']
-        
-        art = art[~art['Article/ID'].isna()]
-        
-        # Nettoyage de la correspondance
-        crpd = crpd.drop_duplicates(subset='Référence', keep='first')
-        crpd['Référence'] = crpd['Référence'].astype('string')
-        
-        st.info(f"📊 Fichier correspondance : {len(crpd)} références")
-        st.info(f"📊 Articles disponibles : {len(art)} articles")
-        
-        # Premier merge avec la correspondance
-        df_merged = df.merge(
-            crpd[['Référence', 'Nom ODOO']],
-            how='left',
-            left_on='REF.',
-            right_on='Référence',
-        )
+        articles, correspondance = self._load_merge_sources(articles_data, correspondance_excel)
+        df_processed, art_non_liés_rl, art_non_liés_od = self._merge_batch(df, articles, correspondance)
+        self._report_merge(df_processed, art_non_liés_rl, art_non_liés_od)
         
-        # Deuxième merge avec les articles ODOO
-        article_columns = [
-            'Article/ID',
-            'Nom',
-            'Fournisseurs/Unité de mesure/Nom affiché',
-            'Taxes fournisseur/ID',
-        ]
-        for optional_column in [
-            'Article ID Odoo',
-            'Fournisseurs/Unité de mesure/ID Odoo',
-            'Taxes fournisseur/ID Odoo',
-        ]:
-            if optional_column in art.columns:
-                article_columns.append(optional_column)
-
-        df_merged = df_merged.merge(
-            art[article_columns],
-            how='left',
-            left_on='Nom ODOO',
-            right_on='Nom',
+        return df_processed, art_non_liés_rl, art_non_liés_od
+    
+    def iter_merge_batches(self, batches, articles_data, correspondance_excel):
+        """
+        Version en flux de merge_with_articles
+        Les articles et la correspondance sont chargés une seule fois, puis chaque
+        lot de lignes (voir iter_clean_batches) est fusionné dès qu'il arrive.
+        L'index continue d'un lot à l'autre, comme pour une fusion en un bloc.
+        
+        Yields:
+            tuple: (df_processed, df_unlinked_rl, df_unlinked_od) pour chaque lot
+        """
+        articles, correspondance = self._load_merge_sources(articles_data, correspondance_excel)
+        offset = 0
+        for batch in batches:
+            merged = self._merge_batch(batch, articles, correspondance)
+            yield tuple(df.set_axis(df.index + offset) for df in merged)
+            offset += sum(len(df) for df in merged)
+    
+    def concatenate_merged_batches(self, merged_batches):
+        """
+        Rassemble les lots fusionnés (voir iter_merge_batches) et publie le bilan de la fusion
+        
+        Args:
+            merged_batches (list): Tuples (df_processed, df_unlinked_rl, df_unlinked_od)
+            
+        Returns:
+            tuple: (df_processed, df_unlinked_rl, df_unlinked_od) complets
+        """
+        df_processed, art_non_liés_rl, art_non_liés_od = (
+            self.concatenate_clean_batches([batch[i] for batch in merged_batches]) for i in range(3)
         )
+        self._report_merge(df_processed, art_non_liés_rl, art_non_liés_od)
+        
+        return df_processed, art_non_liés_rl, art_non_liés_od
+    
+    def _report_merge(self, df_processed, art_non_liés_rl, art_non_liés_od):
+        """Publie le nombre d'articles traités et non liés"""
+        self.events.success(f"✅ Articles traités : {len(df_processed)}")
+        if not art_non_liés_rl.empty:
+            self.events.warning(f"⚠️ Articles non liés RL : {len(art_non_liés_rl)}")
+        if not art_non_liés_od.empty:
+            self.events.warning(f"⚠️ Articles non liés ODOO : {len(art_non_liés_od)}")
+    
+    def _load_merge_sources(self, articles_data, correspondance_excel):
+        """Charge l'index des articles et la correspondance utilisés par la fusion"""
+        # Index des articles, reconstruit seulement si le catalogue a changé
+        if isinstance(articles_data, ArticleIndex):
+            articles = articles_data
+        else:
+            articles = ArticleIndex.for_catalog(articles_data)
+        
+        # Index de correspondance, réanalysé seulement si le contenu du fichier a changé
+        if isinstance(correspondance_excel, CorrespondanceIndex):
+            correspondance = correspondance_excel
+        else:
+            correspondance = CorrespondanceIndex.load(correspondance_excel, self.correspondance_cache)
+        
+        self.events.info(f"📊 Fichier correspondance : {len(correspondance)} références")
+        self.events.info(f"📊 Articles disponibles : {articles.article_count} articles")
+        
+        # Conflits de noms signalés une seule fois, à la construction de l'index
+        if not articles.conflicts.empty and not articles.conflicts_reported:
+            names = articles.conflicts['Nom normalisé'].nunique()
+            self.events.warning(
+                f"⚠️ {names} noms d'articles ODOO en double "
+                f"({len(articles.conflicts)} articles) : le premier article de chaque nom est utilisé"
+            )
+            articles.conflicts_reported = True
+        
+        return articles, correspondance
+    
+    def _merge_batch(self, df, articles, correspondance):
+        """Relie un lot de lignes à la correspondance puis aux articles ODOO"""
+        # Correspondance : lecture directe de l'index Référence -> Nom ODOO
+        df_merged = correspondance.annotate(df)
+        
+        # Articles ODOO : lecture directe de l'index par nom normalisé
+        df_merged = pd.concat([df_merged, articles.resolve(df_merged['Nom ODOO'])], axis=1)
         
         # Articles non liés
         art_non_liés_rl = df_merged[df_merged['Nom ODOO'].isna()]  # Non trouvés dans Correspondance
         art_non_liés_od = df_merged[(df_merged['Article/ID'].isna()) & (~df_merged['Nom ODOO'].isna())]  # Trouvés dans correspondance mais pas dans ODOO
         df_processed = df_merged[~df_merged['Article/ID'].isna()]  # Uniquement ceux complètement traités
         
-        st.success(f"✅ Articles traités : {len(df_processed)}")
-        if not art_non_liés_rl.empty:
-            st.warning(f"⚠️ Articles non liés RL : {len(art_non_liés_rl)}")
-        if not art_non_liés_od.empty:
-            st.warning(f"⚠️ Articles non liés ODOO : {len(art_non_liés_od)}")
-        
         return df_processed, art_non_liés_rl, art_non_liés_od
     
+    def suggest_articles(self, df_unlinked_rl, df_unlinked_od, articles_data, top_k=None):
+        """
+        Propose des articles ODOO proches pour les lignes non liées
+        Les lignes RL sont cherchées par leur DESIGNATION, les lignes ODOO par le
+        Nom ODOO de la correspondance, absent du catalogue.
+        
+        Args:
+            df_unlinked_rl (pd.DataFrame): Articles non liés RL
+            df_unlinked_od (pd.DataFrame): Articles non liés ODOO
+            articles_data: DataFrame ou fichier CSV des articles, ou ArticleIndex déjà construit
+            top_k (int): Nombre de suggestions par ligne (Config.SUGGESTION_TOP_K par défaut)
+            
+        Returns:
+            pd.DataFrame: Une ligne par suggestion, avec l'origine et le score
+        """
+        top_k = top_k or self.config.SUGGESTION_TOP_K
+        if isinstance(articles_data, ArticleIndex):
+            articles = articles_data
+        else:
+            articles = ArticleIndex.for_catalog(articles_data)
+        suggester = articles.suggester(self.config.SUGGESTION_MIN_SCORE)
+        
+        context_columns = ['REF.', 'DESIGNATION', 'Nom ODOO']
+        suggestions = []
+        for origine, df_unlinked, query_column in [
+            ('RL', df_unlinked_rl, 'DESIGNATION'),
+            ('ODOO', df_unlinked_od, 'Nom ODOO'),
+        ]:
+            if df_unlinked.empty:
+                continue
+            df_suggestions = suggester.suggest_frame(
+                df_unlinked, query_column, context_columns, top_k, normalize=ArticleIndex.normalize_names
+            )
+            df_suggestions.insert(0, 'Origine', origine)
+            suggestions.append(df_suggestions)
+        
+        if not suggestions:
+            return pd.DataFrame(columns=['Origine', *context_columns, 'Rang', 'Score',
+                                         'Article/ID (suggestion)', 'Nom (suggestion)'])
+        return pd.concat(suggestions, ignore_index=True)
+    
     def prepare_import_file(self, df, ref_commande, id_fourni):
         """
         Prépare le fichier pour l'import
@@ -260,8 +389,41 @@ class DataProcessor:
         df_import['Lignes de la commande/Taxes/ID'] = df['Taxes fournisseur/ID']
         df_import["Lignes de la commande/Date prévue"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Colonnes avec seulement la première ligne renseignée
-        df_import.loc[df_import.index[0], 'Référence commande'] = ref_commande
-        df_import.loc[df_import.index[0], 'Fournisseur/ID'] = id_fourni
+        # Colonnes avec seulement la première ligne renseignée (aucune si aucun article lié)
+        if not df_import.empty:
+            df_import.loc[df_import.index[0], 'Référence commande'] = ref_commande
+            df_import.loc[df_import.index[0], 'Fournisseur/ID'] = id_fourni
         
         return df_import
+    
+    def iter_import_batches(self, batches, ref_commande, id_fourni):
+        """
+        Version en flux de prepare_import_file
+        La référence commande et le fournisseur ne sont renseignés que sur la
+        première ligne du premier lot non vide, et la date prévue est celle de ce
+        lot, comme pour un import en un bloc. Sans aucune ligne, un seul lot vide
+        (avec ses colonnes) est produit.
+        
+        Args:
+            batches: Itérable de DataFrames de commandes fusionnées
+            
+        Yields:
+            pd.DataFrame: Lots formatés pour l'import
+        """
+        date_column = "Lignes de la commande/Date prévue"
+        date_prevue = None
+        df_empty = None
+        for df in batches:
+            if df.empty:
+                df_empty = df
+                continue
+            df_import = self.prepare_import_file(df, ref_commande, id_fourni)
+            if date_prevue is None:
+                date_prevue = df_import[date_column].iat[0]
+            else:
+                df_import.loc[df_import.index[0], ['Référence commande', 'Fournisseur/ID']] = np.nan
+                df_import[date_column] = date_prevue
+            yield df_import
+        
+        if date_prevue is None and df_empty is not None:
+            yield self.prepare_import_file(df_empty, ref_commande, id_fourni)
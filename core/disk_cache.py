@@ -0,0 +1,123 @@
+"""
+Cache disque de DataFrames.
+
+Chaque entree est un fichier Parquet nomme d'apres sa cle (en general un hash
+du contenu source). La date d'acces sert d'horodatage LRU : elle est
+rafraichie a chaque lecture, et les entrees les moins recemment lues sont
+supprimees des que la taille totale depasse la limite. La date de
+modification reste celle de l'ecriture et donne l'age d'une entree.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+def content_key(*parts) -> str:
+    """Calcule une cle SHA-256 depuis des octets (bytes, memoryview) ou du texte."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Cache LRU de DataFrames au format Parquet, borne en taille."""
+
+    SUFFIX = '.parquet'
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str, max_age: float = None):
+        """
+        Retourne le DataFrame associe a la cle, ou None s'il est absent.
+
+        Avec max_age (secondes), une entree ecrite il y a plus longtemps est
+        consideree comme absente.
+        """
+        path = self._path(key)
+        if max_age is not None:
+            age = self.age(key)
+            if age is None or age > max_age:
+                return None
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Fichier tronque ou illisible : on le traite comme absent
+            self.invalidate(key)
+            return None
+
+        try:
+            # Seule la date d'acces change : la date de modification reste celle de l'ecriture
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except FileNotFoundError:
+            # Entree evincee entre-temps par un autre processus
+            pass
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Enregistre le DataFrame puis applique la limite de taille."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._evict()
+
+    def age(self, key: str):
+        """Secondes ecoulees depuis l'ecriture de l'entree, ou None si elle est absente."""
+        try:
+            return max(0.0, time.time() - self._path(key).stat().st_mtime)
+        except FileNotFoundError:
+            return None
+
+    def invalidate(self, key: str) -> bool:
+        """Supprime une entree. Retourne True si elle existait."""
+        try:
+            self._path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self) -> int:
+        """Supprime toutes les entrees et retourne leur nombre."""
+        count = 0
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
+            count += 1
+        return count
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def _evict(self):
+        """Supprime les entrees les moins recemment lues au-dela de max_bytes."""
+        entries = []
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,75 @@
+"""
+Evenements de progression du traitement.
+
+Le coeur de l'application ne depend d'aucune interface : les messages
+(information, succes, avertissement, erreur) et l'avancement des etapes sont
+publies sur un EventBus. L'application Streamlit, un traitement par lots ou un
+benchmark s'y abonnent chacun a leur facon. Sans abonne, les evenements sont
+seulement journalises (module logging).
+"""
+import logging
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+logger = logging.getLogger('relais_local')
+logger.addHandler(logging.NullHandler())
+
+Event = namedtuple('Event', ['level', 'message', 'data'])
+
+
+class EventBus:
+    """Diffuse les evenements du traitement a des fonctions abonnees."""
+
+    LOG_LEVELS = {
+        'info': logging.INFO,
+        'success': logging.INFO,
+        'warning': logging.WARNING,
+        'error': logging.ERROR,
+        'progress': logging.DEBUG,
+    }
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Abonne callback(event) a tous les evenements ; retourne callback."""
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    @contextmanager
+    def subscribed(self, callback):
+        """Abonnement limite a un bloc `with`."""
+        self.subscribe(callback)
+        try:
+            yield self
+        finally:
+            self.unsubscribe(callback)
+
+    def emit(self, level, message, **data):
+        """Publie un evenement de niveau level ('info', 'success', 'warning', 'error', 'progress')."""
+        event = Event(level, message, data)
+        logger.log(self.LOG_LEVELS.get(level, logging.INFO), message)
+        for callback in list(self._subscribers):
+            callback(event)
+        return event
+
+    def info(self, message, **data):
+        return self.emit('info', message, **data)
+
+    def success(self, message, **data):
+        return self.emit('success', message, **data)
+
+    def warning(self, message, **data):
+        return self.emit('warning', message, **data)
+
+    def error(self, message, **data):
+        return self.emit('error', message, **data)
+
+    def progress(self, stage, message, **data):
+        """Signale le debut d'une etape du traitement."""
+        return self.emit('progress', message, stage=stage, **data)
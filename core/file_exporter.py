@@ -11,14 +11,16 @@ class FileExporter:
     def __init__(self):
         self.config = Config()
     
-    def export_to_excel(self, df_processed, df_unlinked_rl, df_unlinked_od):
+    def export_to_excel(self, df_processed, df_unlinked_rl, df_unlinked_od, df_suggestions=None):
         """
         Exporte les données vers un fichier Excel en mémoire avec 3 onglets
+        (4 avec les suggestions d'articles)
         
         Args:
             df_processed (pd.DataFrame): Commandes traitées
             df_unlinked_rl (pd.DataFrame): Articles non liés RL
             df_unlinked_od (pd.DataFrame): Articles non liés ODOO
+            df_suggestions (pd.DataFrame): Suggestions pour les articles non liés (optionnel)
             
         Returns:
             BytesIO: Buffer contenant le fichier Excel
@@ -29,6 +31,33 @@ class FileExporter:
             df_processed.to_excel(writer, sheet_name='commandes traitée', index=False)
             df_unlinked_rl.to_excel(writer, sheet_name='articles non liés (RL)', index=False)
             df_unlinked_od.to_excel(writer, sheet_name='articles non liés (ODOO)', index=False)
+            if df_suggestions is not None:
+                df_suggestions.to_excel(writer, sheet_name='suggestions articles', index=False)
+        
+        excel_buffer.seek(0)
+        return excel_buffer
+    
+    def export_unlinked_report(self, df_summary, df_unlinked_rl, df_unlinked_od, df_suggestions=None):
+        """
+        Exporte le rapport consolidé d'un traitement par lots
+        
+        Args:
+            df_summary (pd.DataFrame): Résumé par facture
+            df_unlinked_rl (pd.DataFrame): Articles non liés RL de toutes les factures
+            df_unlinked_od (pd.DataFrame): Articles non liés ODOO de toutes les factures
+            df_suggestions (pd.DataFrame): Suggestions pour les articles non liés (optionnel)
+            
+        Returns:
+            BytesIO: Buffer contenant le fichier Excel
+        """
+        excel_buffer = BytesIO()
+        
+        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            df_summary.to_excel(writer, sheet_name='factures', index=False)
+            df_unlinked_rl.to_excel(writer, sheet_name='articles non liés (RL)', index=False)
+            df_unlinked_od.to_excel(writer, sheet_name='articles non liés (ODOO)', index=False)
+            if df_suggestions is not None:
+                df_suggestions.to_excel(writer, sheet_name='suggestions articles', index=False)
         
         excel_buffer.seek(0)
         return excel_buffer
@@ -46,4 +75,69 @@ class FileExporter:
         csv_buffer = BytesIO()
         df_import.to_csv(csv_buffer, index=False, encoding=self.config.ENCODING)
         csv_buffer.seek(0)
-        return csv_buffer
\ No newline at end of file
+        return csv_buffer
+    
+    def export_batches_to_csv(self, batches):
+        """
+        Exporte des lots de données vers un fichier CSV en mémoire, au fil de l'eau
+        L'en-tête n'est écrit qu'une fois ; chaque lot est libéré après écriture.
+        
+        Args:
+            batches: Itérable de DataFrames de même structure (voir DataProcessor.iter_import_batches)
+            
+        Returns:
+            BytesIO: Buffer contenant le fichier CSV
+        """
+        csv_buffer = BytesIO()
+        header = True
+        
+        for df_batch in batches:
+            # Le BOM utf-8-sig ne doit apparaître qu'en tête de fichier
+            encoding = self.config.ENCODING if header else 'utf-8'
+            df_batch.to_csv(csv_buffer, index=False, header=header, encoding=encoding)
+            header = False
+        
+        csv_buffer.seek(0)
+        return csv_buffer
+    
+    def export_batches_to_excel(self, merged_batches, df_suggestions=None):
+        """
+        Exporte des lots fusionnés vers un fichier Excel en mémoire avec 3 onglets
+        (4 avec les suggestions d'articles)
+        Chaque lot est ajouté à la suite des précédents dans ses onglets.
+        
+        Args:
+            merged_batches: Itérable de tuples (df_processed, df_unlinked_rl, df_unlinked_od)
+            df_suggestions (pd.DataFrame): Suggestions pour les articles non liés (optionnel)
+            
+        Returns:
+            BytesIO: Buffer contenant le fichier Excel
+        """
+        sheet_names = ['commandes traitée', 'articles non liés (RL)', 'articles non liés (ODOO)']
+        next_rows = dict.fromkeys(sheet_names, 0)
+        excel_buffer = BytesIO()
+        
+        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            for batch in merged_batches:
+                for sheet_name, df_batch in zip(sheet_names, batch):
+                    start_row = next_rows[sheet_name]
+                    if start_row and df_batch.empty:
+                        continue
+                    df_batch.to_excel(
+                        writer,
+                        sheet_name=sheet_name,
+                        index=False,
+                        header=start_row == 0,
+                        startrow=start_row,
+                    )
+                    next_rows[sheet_name] = start_row + len(df_batch) + (start_row == 0)
+            
+            # Onglets toujours présents, même sans aucun lot
+            for sheet_name in sheet_names:
+                if sheet_name not in writer.sheets:
+                    pd.DataFrame().to_excel(writer, sheet_name=sheet_name, index=False)
+            if df_suggestions is not None:
+                df_suggestions.to_excel(writer, sheet_name='suggestions articles', index=False)
+        
+        excel_buffer.seek(0)
+        return excel_buffer
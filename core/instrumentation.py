@@ -0,0 +1,183 @@
+"""
+Instrumentation des etapes du traitement.
+
+Chaque etape mesure le temps ecoule, le temps CPU du thread appelant et le pic
+memoire Python (tracemalloc) atteint pendant l'etape, au-dessus de la memoire
+deja allouee a son debut. Les mesures sont gardees en memoire pour l'interface
+et ajoutees a un fichier JSON lines.
+
+Les etapes peuvent etre imbriquees, ou entrelacees quand elles suivent des
+generateurs en flux (track) : le temps d'une etape exclut celui des etapes
+appelees pendant qu'elle s'execute.
+
+tracemalloc est global au processus : il reste actif tant qu'un profiler qui
+mesure la memoire n'est pas ferme (close), et le pic d'une etape couvre toutes
+les allocations du processus, y compris celles des traitements concurrents
+(autres sessions de l'application).
+"""
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from contextlib import contextmanager
+
+# Demarrage, arret et remise a zero du pic de tracemalloc, partages par tous les profilers
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+# Etape en cours de chaque profiler : le pic lui est reporte avant chaque remise a zero
+_running_frames = {}
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        # tracemalloc demarre hors des profilers n'est pas arrete
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def _reset_peak():
+    """Reporte le pic courant sur les etapes en cours puis le remet a zero (sous _tracing_lock)."""
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in _running_frames.values():
+        totals = frame['totals']
+        totals['peak'] = max(totals['peak'], peak - frame['base'])
+    tracemalloc.reset_peak()
+
+
+class StageProfiler:
+    """Mesure le temps et la memoire de chaque etape d'un traitement."""
+
+    def __init__(self, log_path=None, trace_memory=True, context=None):
+        self.log_path = log_path
+        self.trace_memory = trace_memory
+        self.context = dict(context or {})
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._stack = []
+        self._tracing_finalizer = None
+
+    @contextmanager
+    def stage(self, name, **context):
+        """Mesure le bloc `with` comme une etape."""
+        totals = self._new_totals()
+        self._enter(totals)
+        try:
+            yield
+        finally:
+            self._exit(totals)
+            self._record(name, totals, context)
+
+    def track(self, name, iterable, **context):
+        """
+        Mesure le travail d'un generateur comme une etape.
+
+        Seul le temps passe a produire chaque element est compte ; la mesure est
+        enregistree quand le generateur est epuise ou ferme.
+        """
+        iterator = iter(iterable)
+        totals = self._new_totals()
+        try:
+            while True:
+                self._enter(totals)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit(totals)
+                yield item
+        finally:
+            self._record(name, totals, context)
+
+    def close(self):
+        """Libere tracemalloc, arrete quand plus aucun profiler ne mesure la memoire."""
+        if self._tracing_finalizer is not None and not self._stack:
+            self._tracing_finalizer()
+            self._tracing_finalizer = None
+
+    @staticmethod
+    def _new_totals():
+        return {'wall': 0.0, 'cpu': 0.0, 'peak': 0, 'calls': 0}
+
+    def _enter(self, totals):
+        if self.trace_memory and self._tracing_finalizer is None:
+            _acquire_tracing()
+            self._tracing_finalizer = weakref.finalize(self, _release_tracing)
+
+        frame = {
+            'totals': totals,
+            'wall': time.perf_counter(),
+            'cpu': time.thread_time(),
+            'child_wall': 0.0,
+            'child_cpu': 0.0,
+            'base': 0,
+        }
+        if self.trace_memory:
+            with _tracing_lock:
+                # Le parent ne compte pas le pic de l'etape enfant
+                _reset_peak()
+                if self._stack:
+                    del _running_frames[id(self._stack[-1])]
+                frame['base'] = tracemalloc.get_traced_memory()[0]
+                _running_frames[id(frame)] = frame
+        self._stack.append(frame)
+
+    def _exit(self, totals):
+        frame = self._stack.pop()
+        wall = time.perf_counter() - frame['wall']
+        cpu = time.thread_time() - frame['cpu']
+        if self.trace_memory:
+            with _tracing_lock:
+                _reset_peak()
+                del _running_frames[id(frame)]
+                if self._stack:
+                    _running_frames[id(self._stack[-1])] = self._stack[-1]
+
+        totals['wall'] += wall - frame['child_wall']
+        totals['cpu'] += cpu - frame['child_cpu']
+        totals['calls'] += 1
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent['child_wall'] += wall
+            parent['child_cpu'] += cpu
+
+    def _record(self, name, totals, context):
+        record = {
+            'run_id': self.run_id,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'stage': name,
+            'wall_seconds': round(totals['wall'], 6),
+            'cpu_seconds': round(totals['cpu'], 6),
+            'peak_memory_mb': (
+                round(totals['peak'] / (1024 * 1024), 3) if self.trace_memory else None
+            ),
+            'calls': totals['calls'],
+            **self.context,
+            **context,
+        }
+        self.records.append(record)
+
+        if self.log_path:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as log_file:
+                log_file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,140 @@
+"""
+Client JSON-RPC Odoo asynchrone (asyncio + aiohttp).
+
+odoorpc execute les requetes une par une. Ce client envoie les appels sur une
+seule session HTTP keep-alive, et les appels independants peuvent etre lances
+en meme temps, dans la limite de max_concurrency appels simultanes.
+
+Comme odoorpc, le client s'authentifie une fois (/web/session/authenticate)
+puis appelle les modeles avec le cookie de session (/web/dataset/call_kw) :
+le mot de passe n'est pas conserve apres l'authentification, et les appels
+utilisent le contexte (langue...) de l'utilisateur.
+
+OdooConnector l'utilise a travers AsyncOdooExecutor (voir odoo_executor) :
+
+    async with AsyncOdooClient(url, port) as client:
+        await client.authenticate(database, username, password)
+        records = await client.search_read('product.product', [('active', '=', True)], ['name'])
+"""
+import asyncio
+import itertools
+
+from .config import Config
+
+
+class OdooRPCError(Exception):
+    """Erreur retournee par le serveur Odoo a un appel (domaine invalide, droits...)."""
+
+
+class OdooTransportError(Exception):
+    """Point d'acces JSON-RPC injoignable ou invalide, ou session Odoo refusee ou expiree."""
+
+
+class AsyncOdooClient:
+    """Appels JSON-RPC Odoo concurrents sur une session HTTP partagee."""
+
+    # Erreurs Odoo qui invalident la session plutot que l'appel
+    AUTH_ERRORS = ('SessionExpiredException', 'AccessDenied')
+
+    def __init__(self, url: str, port: int = 443, protocol: str = 'jsonrpc+ssl',
+                 max_concurrency: int = None, timeout: float = 120):
+        """
+        Args:
+            url (str): Hote du serveur Odoo
+            port (int): Port du serveur
+            protocol (str): 'jsonrpc+ssl' (https) ou 'jsonrpc' (http), comme odoorpc
+            max_concurrency (int): Appels simultanes (Config.ODOO_MAX_WORKERS par defaut)
+            timeout (float): Delai maximal d'un appel, en secondes
+        """
+        scheme = 'https' if protocol.endswith('+ssl') else 'http'
+        self.base_url = f"{scheme}://{url}:{port}"
+        self.uid = None
+        self.max_concurrency = max_concurrency or Config.ODOO_MAX_WORKERS
+        self.timeout = timeout
+        self.session = None
+        self._semaphore = None
+        self._ids = itertools.count(1)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Ouvre la session HTTP (connexions et cookie de session conserves entre les appels)."""
+        import aiohttp
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                # Cookie de session accepte aussi d'un serveur designe par son adresse IP
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def call(self, path: str, params: dict):
+        """
+        Appel JSON-RPC brut d'une route Odoo.
+
+        Raises:
+            OdooTransportError: Serveur injoignable, reponse invalide, session refusee ou expiree
+            OdooRPCError: Erreur retournee par Odoo pour cet appel
+        """
+        import aiohttp
+
+        if self.session is None:
+            await self.open()
+        payload = {'jsonrpc': '2.0', 'method': 'call', 'params': params, 'id': next(self._ids)}
+        try:
+            async with self._semaphore:
+                async with self.session.post(self.base_url + path, json=payload) as response:
+                    response.raise_for_status()
+                    result = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise OdooTransportError(f"{path} : {str(e) or type(e).__name__}") from e
+        if not isinstance(result, dict):
+            raise OdooTransportError(f"{path} : reponse JSON-RPC invalide")
+
+        error = result.get('error')
+        if error:
+            data = error.get('data') or {}
+            message = data.get('message') or error.get('message')
+            if any(name in str(data.get('name', '')) for name in self.AUTH_ERRORS):
+                raise OdooTransportError(message)
+            raise OdooRPCError(message)
+        return result.get('result')
+
+    async def authenticate(self, database: str, username: str, password: str) -> int:
+        """Ouvre une session Odoo ; retourne l'uid de l'utilisateur. Le mot de passe n'est pas conserve."""
+        result = await self.call('/web/session/authenticate', {'db': database, 'login': username, 'password': password})
+        uid = result.get('uid') if isinstance(result, dict) else None
+        if not uid:
+            raise OdooTransportError("Identifiants Odoo refuses")
+        self.uid = uid
+        return uid
+
+    async def execute_kw(self, model: str, method: str, args: list, kwargs: dict = None):
+        return await self.call(
+            f'/web/dataset/call_kw/{model}/{method}',
+            {'model': model, 'method': method, 'args': list(args), 'kwargs': kwargs or {}},
+        )
+
+    async def search(self, model: str, domain: list) -> list:
+        return await self.execute_kw(model, 'search', [domain])
+
+    async def search_read(self, model: str, domain: list, fields: list, **kwargs) -> list:
+        return await self.execute_kw(model, 'search_read', [domain, fields], kwargs)
+
+    async def read(self, model: str, ids: list, fields: list) -> list:
+        return await self.execute_kw(model, 'read', [ids, fields])
+
+    async def write(self, model: str, ids: list, values: dict) -> bool:
+        return await self.execute_kw(model, 'write', [ids, values])
@@ -2,11 +2,26 @@
 Connexion, lecture et ecriture des donnees Odoo.
 """
 import datetime
+import hashlib
+import hmac
+import importlib.util
+import os
+import re
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Optional
 
+import numpy as np
 import odoorpc
 import pandas as pd
-import streamlit as st
+
+from .article_index import ArticleIndex
+from .catalog_snapshot import CatalogSnapshot
+from .config import Config
+from .disk_cache import content_key
+from .events import EventBus
+from .odoo_async import OdooTransportError
+from .odoo_executor import AsyncOdooExecutor, OdoorpcExecutor
 
 
 class OdooConnector:
@@ -27,51 +42,528 @@ class OdooConnector:
         "Taux de marque 25%-Consigne 3€": 34.1382,
     }
 
-    def __init__(self):
+    _compiled_margins = None
+
+    # Champs lus pour la mise a jour des prix
+    PRICE_PRODUCT_FIELDS = [
+        'id',
+        'name',
+        'standard_price',
+        'list_price',
+        'product_tmpl_id',
+        'taxes_id',
+        'margin_classification_id',
+    ]
+    PRICE_SUPPLIER_FIELDS = ['id', 'product_tmpl_id', 'product_id', 'price', 'product_uom']
+
+    # Tables brutes du catalogue, telechargees en parallele par tranches d'ids
+    CATALOG_QUERIES = {
+        'products': (
+            'product.product', [('active', '=', True)],
+            ['id', 'name', 'product_tmpl_id', 'uom_po_id', 'write_date'],
+        ),
+        'external_ids': (
+            'ir.model.data', [('model', '=', 'product.product')],
+            ['res_id', 'complete_name', 'write_date'],
+        ),
+        # Limitee au fournisseur configure par catalog_queries
+        'suppliers': (
+            'product.supplierinfo', [],
+            ['id', 'product_tmpl_id', 'product_id', 'product_uom', 'write_date'],
+        ),
+    }
+    TEMPLATE_FIELDS = ['id', 'supplier_taxes_id', 'write_date']
+    CATALOG_WARNINGS = {
+        'external_ids': "Impossible de recuperer les ID externes",
+        'suppliers': "Impossible de recuperer les infos fournisseurs",
+        'templates': "Impossible de recuperer les taxes",
+    }
+
+    def __init__(self, events=None, snapshot_dir=None, supplier_external_id=None, pool=None, async_rpc=None):
         self.odoo = None
         self.connected = False
+        self.events = events or EventBus()
+        # Dossier des instantanes SQLite du catalogue (synchronisation incrementale)
+        self.snapshot_dir = snapshot_dir
+        self.server = None
+        # Fournisseur dont les lignes (unite d'achat) alimentent le catalogue
+        self.supplier_external_id = supplier_external_id or Config.ID_FOURNI_DEFAULT
+        # Pool de connexions authentifiees (OdooConnectionPool), partage entre connecteurs
+        self.pool = pool
+        # Lectures envoyees en meme temps par AsyncOdooClient, sur une session HTTP conservee
+        self.async_rpc = Config.ODOO_ASYNC_RPC if async_rpc is None else async_rpc
+        self._async_executor = None
+        self._async_finalizer = None
+        # Serveur, base, utilisateur et empreinte du mot de passe du client asynchrone
+        self._async_key = None
+        self._secret = os.urandom(32)
 
     def connect(self, url: str, port: int, database: str, username: str, password: str) -> bool:
         """Etablit la connexion a Odoo."""
         try:
-            self.odoo = odoorpc.ODOO(url, port=port, protocol='jsonrpc+ssl')
-            self.odoo.login(database, username, password)
+            if self.pool is not None:
+                # Connexion deja authentifiee reprise du pool, pretee a ce seul connecteur
+                self.odoo = self.pool.checkout(self, url, port, database, username, password)
+            else:
+                self.odoo = odoorpc.ODOO(url, port=port, protocol='jsonrpc+ssl')
+                self.odoo.login(database, username, password)
             self.connected = True
-            return True
+            self.server = {'url': url, 'port': port, 'database': database}
         except Exception as e:
-            st.error(f"Erreur de connexion a Odoo : {str(e)}")
+            self.events.error(f"Erreur de connexion a Odoo : {str(e)}")
+            # La connexion precedente a pu etre rendue au pool : plus rien ne doit s'en servir
+            self.odoo = None
+            self.server = None
+            self._close_async_rpc()
             self.connected = False
             return False
 
+        # Client asynchrone conserve (session deja authentifiee) tant que les identifiants ne changent pas
+        async_key = (str(url), int(port), str(database), str(username),
+                     hmac.new(self._secret, str(password).encode('utf-8'), hashlib.sha256).digest())
+        if not self.async_rpc:
+            self._close_async_rpc()
+        elif async_key != self._async_key:
+            self._close_async_rpc()
+            self._open_async_rpc(url, port, database, username, password)
+            self._async_key = async_key
+        return True
+
+    def _open_async_rpc(self, url, port, database, username, password, protocol='jsonrpc+ssl'):
+        """
+        Ouvre le client JSON-RPC asynchrone de ce connecteur. Il s'authentifie
+        une fois et garde sa session HTTP jusqu'a disconnect() ou un changement
+        d'identifiants : le mot de passe n'est pas conserve. En cas d'echec, les
+        lectures passent par odoorpc, sans nouvel essai avant un changement
+        d'identifiants ou une deconnexion.
+        """
+        if importlib.util.find_spec('aiohttp') is None:
+            return
+        executor = AsyncOdooExecutor(url, port, protocol)
+        try:
+            executor.authenticate(database, username, password)
+        except Exception as e:
+            executor.close()
+            self.events.warning(f"Requetes Odoo en parallele indisponibles, requetes sequentielles : {str(e)}")
+            return
+        self._async_executor = executor
+        # Boucle et session fermees aussi quand le connecteur disparait (fin de session Streamlit)
+        self._async_finalizer = weakref.finalize(self, executor.close)
+
+    def _close_async_rpc(self):
+        if self._async_finalizer is not None:
+            self._async_finalizer()
+        self._async_executor = None
+        self._async_finalizer = None
+        self._async_key = None
+
+    def _run_plan(self, plan, max_workers: int = None):
+        """
+        Execute plan(executor), un plan de lectures ecrit une seule fois pour les
+        deux transports : via le client asynchrone s'il est ouvert, sinon via
+        odoorpc. Une erreur de transport (point d'acces injoignable, session
+        refusee ou expiree) ferme le client asynchrone (rouvert au prochain
+        connect) et le plan est rejoue via odoorpc ; les autres erreurs remontent
+        telles quelles.
+        """
+        if self._async_executor is not None:
+            try:
+                return plan(self._async_executor)
+            except OdooTransportError as e:
+                self.events.warning(f"Requetes Odoo en parallele indisponibles, requetes sequentielles : {str(e)}")
+                self._close_async_rpc()
+        with OdoorpcExecutor(self.odoo, max_workers) as executor:
+            return plan(executor)
+
     def get_product_variants(self) -> Optional[pd.DataFrame]:
         """Recupere les variantes d'articles (product.product) depuis Odoo."""
         if not self.connected:
-            st.error("Non connecte a Odoo")
+            self.events.error("Non connecte a Odoo")
             return None
 
         try:
-            Product = self.odoo.env['product.product']
-            articles_data = Product.search_read(
-                [('active', '=', True)],
-                ['id', 'name', 'product_tmpl_id', 'uom_po_id']
-            )
-
-            df_articles = pd.DataFrame(articles_data)
-            if df_articles.empty:
-                st.warning("Aucun article trouve dans Odoo")
+            if self.snapshot_dir:
+                tables = self.sync_catalog_tables(CatalogSnapshot(self.snapshot_path()))
+            else:
+                tables = self.fetch_catalog_tables()
+            if tables['products'].empty:
+                self.events.warning("Aucun article trouve dans Odoo")
                 return None
 
-            df_articles = self._get_external_ids(df_articles)
-            df_articles = self._get_supplier_info(df_articles)
-            df_articles = self._get_tax_info(df_articles)
-            df_articles = self._rename_columns(df_articles)
+            return self.assemble_catalog(tables)
 
-            return df_articles
+        except Exception as e:
+            self.events.error(f"Erreur lors de la recuperation des articles : {str(e)}")
+            return None
 
+    def get_catalog_for_names(self, names) -> Optional[pd.DataFrame]:
+        """
+        Recupere seulement les variantes actives portant les noms donnes (noms
+        ODOO des lignes d'une facture), au meme format que get_product_variants.
+
+        Quelques search_read groupes : variantes par nom, puis en parallele leurs
+        ID externes, lignes fournisseurs et modeles, puis les ID externes des
+        taxes. Le trafic depend de la taille de la facture, pas du catalogue.
+        Les noms sont compares comme lors de la fusion sur le catalogue complet
+        (sans casse, espaces normalises) : les deux modes lient les memes lignes.
+        """
+        if not self.connected:
+            self.events.error("Non connecte a Odoo")
+            return None
+
+        names = sorted({name for name in names if isinstance(name, str) and name.strip()})
+        try:
+            tables = self.fetch_catalog_tables_for_names(names)
+            if tables['products'].empty:
+                return self._rename_columns(pd.DataFrame())
+            return self.assemble_catalog(tables)
         except Exception as e:
-            st.error(f"Erreur lors de la recuperation des articles : {str(e)}")
+            self.events.error(f"Erreur lors de la recuperation des articles : {str(e)}")
             return None
 
+    def fetch_catalog_tables_for_names(self, names: list) -> dict:
+        """Tables brutes du catalogue restreintes aux variantes portant ces noms."""
+        queries = self.catalog_queries()
+        return self._run_plan(lambda executor: self._fetch_tables_for_names(executor, queries, names))
+
+    def _fetch_tables_for_names(self, executor, queries: dict, names: list) -> dict:
+        """Plan de fetch_catalog_tables_for_names : variantes, puis leurs tables liees en parallele."""
+        tables = {name: pd.DataFrame() for name in [*queries, 'templates', 'tax_external_ids']}
+        if not names:
+            return tables
+        product_model, product_domain, product_fields = queries['products']
+        products = pd.DataFrame(executor.call(
+            product_model, 'search_read', product_domain + self._name_domain(names), product_fields
+        ))
+        if products.empty:
+            return tables
+        # Le domaine ratisse large (espaces) : on ne garde que les noms egaux une fois normalises
+        keys = set(ArticleIndex.normalize_names(pd.Series(names, dtype='string')).dropna())
+        products = products[ArticleIndex.normalize_names(products['name']).isin(keys).fillna(False).to_numpy(bool)]
+        tables['products'] = products.reset_index(drop=True)
+        if tables['products'].empty:
+            return tables
+
+        product_ids = sorted(int(product_id) for product_id in tables['products']['id'])
+        template_ids = self._template_ids([tables['products']])
+        scoped = {
+            'external_ids': [('res_id', 'in', product_ids)],
+            'suppliers': [('product_tmpl_id', 'in', template_ids)],
+        }
+        futures = {
+            name: executor.submit(queries[name][0], 'search_read', queries[name][1] + domain, queries[name][2])
+            for name, domain in scoped.items()
+        }
+        futures['templates'] = executor.submit(
+            'product.template', 'search_read', [('id', 'in', template_ids)], self.TEMPLATE_FIELDS
+        )
+        for name, future in futures.items():
+            try:
+                tables[name] = pd.DataFrame(future.result())
+            except OdooTransportError:
+                raise
+            except Exception as e:
+                # Table optionnelle : meme comportement que le catalogue complet
+                tables[name] = None
+                self._emit_catalog_warning(name, e)
+
+        if tables['templates'] is None:
+            tables['tax_external_ids'] = None
+        else:
+            tax_ids = self._first_tax_ids([tables['templates']])
+            if tax_ids:
+                tables['tax_external_ids'] = pd.DataFrame(executor.call(
+                    'ir.model.data', 'search_read',
+                    [('model', '=', 'account.tax'), ('res_id', 'in', tax_ids)],
+                    ['res_id', 'complete_name'],
+                ))
+
+        for name, table in tables.items():
+            if table is not None and 'id' in table.columns:
+                tables[name] = table.sort_values('id', ignore_index=True)
+        return tables
+
+    @staticmethod
+    def _name_domain(names: list) -> list:
+        """
+        Domaine Odoo des variantes dont le nom vaut l'un des noms, sans tenir
+        compte de la casse : un terme =ilike par nom, les jokers SQL echappes et
+        chaque suite d'espaces remplacee par % (filtre exact ensuite).
+        """
+        patterns = sorted({
+            '%'.join(re.sub(r'([\\%_])', r'\\\1', word) for word in name.split()).lower()
+            for name in names
+        })
+        return ['|'] * (len(patterns) - 1) + [('name', '=ilike', pattern) for pattern in patterns]
+
+    def catalog_queries(self) -> dict:
+        """
+        Requetes des tables du catalogue, les lignes fournisseurs limitees au
+        fournisseur configure (toutes les lignes s'il est introuvable).
+        """
+        queries = dict(self.CATALOG_QUERIES)
+        try:
+            partner_id, _ = self._resolve_supplier_partner(self.supplier_external_id)
+        except Exception as e:
+            self.events.warning(f"Fournisseur {self.supplier_external_id} introuvable, lignes de tous les fournisseurs : {str(e)}")
+            return queries
+
+        model, domain, fields = queries['suppliers']
+        queries['suppliers'] = (model, domain + [('name', '=', partner_id)], fields)
+        return queries
+
+    def fetch_catalog_tables(self, chunk_size: int = None, max_workers: int = None, queries: dict = None) -> dict:
+        """
+        Telecharge les tables brutes du catalogue.
+
+        Chaque requete est decoupee en tranches d'ids (une recherche des ids, puis
+        un search_read par tranche) soumises ensemble a l'executeur (client
+        asynchrone ou pool de threads odoorpc borne) : les modeles independants
+        sont lus en meme temps, et les taxes des modeles d'articles des que les
+        variantes sont connues.
+
+        Args:
+            queries (dict): Requetes des tables (catalog_queries() par defaut)
+
+        Returns:
+            dict: DataFrames 'products', 'external_ids', 'suppliers', 'templates' et
+                'tax_external_ids' ; None pour une table optionnelle indisponible
+        """
+        queries = queries or self.catalog_queries()
+        chunk_size = chunk_size or Config.ODOO_CHUNK_SIZE
+        return self._run_plan(
+            lambda executor: self._fetch_tables(executor, queries, chunk_size),
+            max_workers or Config.ODOO_MAX_WORKERS,
+        )
+
+    def _fetch_tables(self, executor, queries: dict, chunk_size: int) -> dict:
+        """Plan de fetch_catalog_tables, quel que soit l'executeur."""
+        frames = {name: [] for name in [*queries, 'templates', 'tax_external_ids']}
+        remaining = {}
+        failed = set()
+        pending = {}
+        progress = {'done': 0, 'total': 0}
+
+        def submit(task, name, model, method, *args):
+            pending[executor.submit(model, method, *args)] = (task, name)
+
+        def submit_chunks(name, model, fields, domains):
+            remaining[name] = len(domains)
+            progress['total'] += len(domains)
+            for domain in domains:
+                submit('chunk', name, model, 'search_read', domain, fields)
+            if not domains:
+                table_done(name)
+
+        def table_done(name):
+            if name == 'products' and 'products' not in failed:
+                # Les taxes sont portees par les modeles des variantes recues : chaque
+                # tranche ne demande que ses propres ids
+                template_ids = self._template_ids(frames['products'])
+                submit_chunks('templates', 'product.template', self.TEMPLATE_FIELDS, [
+                    [('id', 'in', template_ids[start:start + chunk_size])]
+                    for start in range(0, len(template_ids), chunk_size)
+                ])
+            elif name == 'templates' and 'templates' not in failed:
+                tax_ids = self._first_tax_ids(frames['templates'])
+                if tax_ids:
+                    submit('table', 'tax_external_ids', 'ir.model.data', 'search_read',
+                           [('model', '=', 'account.tax'), ('res_id', 'in', tax_ids)],
+                           ['res_id', 'complete_name'])
+
+        for name, (model, domain, fields) in queries.items():
+            submit('search', name, model, 'search', domain)
+
+        try:
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, name = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if name == 'products' or isinstance(e, OdooTransportError):
+                            raise
+                        # Table optionnelle : meme comportement qu'une requete unique en echec
+                        table = 'templates' if name == 'tax_external_ids' else name
+                        if table not in failed:
+                            failed.add(table)
+                            self._emit_catalog_warning(table, e)
+                        continue
+
+                    if task == 'search':
+                        model, domain, fields = queries[name]
+                        submit_chunks(name, model, fields, [
+                            domain + [('id', '>=', first_id), ('id', '<=', last_id)]
+                            for first_id, last_id in self._id_ranges(sorted(result), chunk_size)
+                        ])
+                    elif task == 'chunk':
+                        frames[name].append(pd.DataFrame(result))
+                        remaining[name] -= 1
+                        progress['done'] += 1
+                        self._emit_catalog_progress(progress['done'], progress['total'])
+                        if remaining[name] == 0:
+                            table_done(name)
+                    else:
+                        frames[name].append(pd.DataFrame(result))
+        finally:
+            # Echec : les requetes encore en attente sont abandonnees
+            for future in pending:
+                future.cancel()
+
+        tables = {}
+        for name, chunks in frames.items():
+            if name in failed or (name == 'tax_external_ids' and 'templates' in failed):
+                tables[name] = None
+            else:
+                chunks = [chunk for chunk in chunks if not chunk.empty]
+                tables[name] = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        # Ordre stable (par id) quel que soit l'ordre d'arrivee des tranches
+        for name, table in tables.items():
+            if table is not None and 'id' in table.columns:
+                tables[name] = table.sort_values('id', ignore_index=True)
+        return tables
+
+    def _emit_catalog_progress(self, done, total):
+        self.events.progress(
+            'catalogue', f"Catalogue Odoo : {done}/{total} tranches recues", done=done, total=total,
+        )
+
+    def _emit_catalog_warning(self, table, error):
+        self.events.warning(f"{self.CATALOG_WARNINGS[table]} : {str(error)}")
+
+    def snapshot_path(self) -> str:
+        """Instantane du catalogue du serveur et de la base connectes."""
+        name = f"{self.server['url']}_{self.server['port']}_{self.server['database']}"
+        return os.path.join(self.snapshot_dir, re.sub(r'[^\w.-]', '_', name) + '.sqlite')
+
+    def sync_catalog_tables(self, snapshot: CatalogSnapshot) -> dict:
+        """
+        Met a jour l'instantane local puis retourne les tables du catalogue.
+
+        Le premier appel (ou apres un changement des requetes) telecharge tout le
+        catalogue ; les suivants ne lisent que les enregistrements modifies depuis
+        la derniere synchronisation (write_date), et la liste des ids encore
+        actifs pour retirer les enregistrements supprimes ou archives.
+        """
+        queries = self.catalog_queries()
+        signature = self._catalog_signature(queries)
+        try:
+            if snapshot.is_ready(signature):
+                try:
+                    changed = self._run_plan(lambda executor: self._sync_snapshot(executor, snapshot, queries))
+                    self.events.info(f"Catalogue Odoo synchronise : {changed} enregistrements modifies ou relus")
+                    return snapshot.load_tables()
+                except Exception as e:
+                    self.events.warning(
+                        f"Synchronisation incrementale impossible, telechargement complet : {str(e)}"
+                    )
+
+            tables = self.fetch_catalog_tables(queries=queries)
+            # Un instantane incomplet (table optionnelle en echec) n'est pas conserve
+            if all(table is not None for table in tables.values()):
+                snapshot.replace_all(tables, signature)
+            return tables
+        finally:
+            snapshot.close()
+
+    def _sync_snapshot(self, executor, snapshot: CatalogSnapshot, queries: dict) -> int:
+        """
+        Applique a l'instantane les modifications faites dans Odoo depuis son
+        filigrane, moins Config.ODOO_SYNC_OVERLAP_SECONDS : Odoo date une
+        ecriture du debut de sa transaction, qui peut etre validee apres la
+        synchronisation precedente avec une write_date anterieure au filigrane.
+        Les enregistrements relus deux fois sont simplement reecrits.
+        """
+        watermark = datetime.datetime.fromisoformat(snapshot.watermark)
+        overlap = datetime.timedelta(seconds=Config.ODOO_SYNC_OVERLAP_SECONDS)
+        since = [('write_date', '>=', (watermark - overlap).strftime('%Y-%m-%d %H:%M:%S'))]
+
+        futures = {
+            name: (
+                executor.submit(model, 'search_read', domain + since, fields),
+                executor.submit(model, 'search', domain),
+            )
+            for name, (model, domain, fields) in queries.items()
+        }
+        changed_templates = executor.submit('product.template', 'search_read', since, self.TEMPLATE_FIELDS)
+        changes = {name: changed.result() for name, (changed, _) in futures.items()}
+        retained = {name: ids.result() for name, (_, ids) in futures.items()}
+        changed_templates = changed_templates.result()
+
+        # Modeles utilises par les variantes actives apres synchronisation
+        products = {int(record['id']): record for record in snapshot.load_tables()['products'].to_dict('records')}
+        products.update((int(record['id']), record) for record in changes['products'])
+        active_ids = set(retained['products'])
+        template_ids = {
+            self._many2one_id(record['product_tmpl_id'])
+            for product_id, record in products.items()
+            if product_id in active_ids
+        }
+        template_ids.discard(None)
+
+        known_templates = snapshot.record_ids('templates')
+        changes['templates'] = [record for record in changed_templates if record['id'] in template_ids]
+        new_template_ids = sorted(template_ids - known_templates - {record['id'] for record in changes['templates']})
+        if new_template_ids:
+            changes['templates'] += executor.call(
+                'product.template', 'search_read', [('id', 'in', new_template_ids)], self.TEMPLATE_FIELDS
+            )
+        retained['templates'] = template_ids
+
+        # Les ID externes des taxes sont peu nombreux : relus en entier
+        templates = {int(record['id']): record for record in snapshot.load_tables()['templates'].to_dict('records')}
+        templates.update((record['id'], record) for record in changes['templates'])
+        tax_ids = sorted({
+            record['supplier_taxes_id'][0]
+            for template_id, record in templates.items()
+            if template_id in template_ids and record.get('supplier_taxes_id')
+        })
+        tax_external_ids = []
+        if tax_ids:
+            tax_external_ids = executor.call(
+                'ir.model.data', 'search_read',
+                [('model', '=', 'account.tax'), ('res_id', 'in', tax_ids)],
+                ['res_id', 'complete_name'],
+            )
+
+        snapshot.apply_changes(changes, retained, {'tax_external_ids': tax_external_ids})
+        return sum(len(records) for records in changes.values())
+
+    def _catalog_signature(self, queries: dict) -> str:
+        return content_key(repr(sorted(queries.items())), repr(self.TEMPLATE_FIELDS))
+
+    def assemble_catalog(self, tables: dict) -> pd.DataFrame:
+        """Construit le catalogue au format de l'app depuis les tables brutes."""
+        df_articles = tables['products'].copy()
+        df_articles = self._get_external_ids(df_articles, tables.get('external_ids'))
+        df_articles = self._get_supplier_info(df_articles, tables.get('suppliers'))
+        df_articles = self._get_tax_info(df_articles, tables.get('templates'), tables.get('tax_external_ids'))
+        return self._rename_columns(df_articles)
+
+    @staticmethod
+    def _id_ranges(ids, chunk_size) -> list:
+        """Decoupe une liste d'ids triee en intervalles [premier, dernier] de chunk_size ids."""
+        return [
+            (ids[start], ids[min(start + chunk_size, len(ids)) - 1])
+            for start in range(0, len(ids), chunk_size)
+        ]
+
+    def _template_ids(self, product_chunks) -> list:
+        template_ids = set()
+        for chunk in product_chunks:
+            if not chunk.empty:
+                template_ids.update(chunk['product_tmpl_id'].apply(self._many2one_id).dropna().tolist())
+        return sorted(int(template_id) for template_id in template_ids)
+
+    @staticmethod
+    def _first_tax_ids(template_chunks) -> list:
+        tax_ids = set()
+        for chunk in template_chunks:
+            if not chunk.empty:
+                tax_ids.update(value[0] for value in chunk['supplier_taxes_id'] if value)
+        return sorted(tax_ids)
+
     def create_purchase_order(self, df_processed: pd.DataFrame, ref_commande: str, id_fourni: str) -> dict:
         """Cree une demande de prix Odoo depuis les lignes traitees."""
         if not self.connected:
@@ -137,37 +629,7 @@ class OdooConnector:
             right_on='id',
         )
         preview['Fournisseur'] = supplier_name
-        preview['Nouveau prix fournisseur'] = preview['PU Net'].astype(float)
-        preview['Ratio unite fournisseur'] = preview['Ratio unite fournisseur'].fillna(1).astype(float)
-        preview['Nouveau cout'] = (preview['Nouveau prix fournisseur'] * preview['Ratio unite fournisseur']).round(2)
-        preview['Nouveau prix de vente'] = preview.apply(
-            lambda row: self._compute_sale_price(
-                row['Nouveau cout'],
-                row.get('Taxe vente montant'),
-                row.get('Categorie marge'),
-            ),
-            axis=1,
-        )
-        preview['Ecart prix fournisseur'] = (
-            preview['Nouveau prix fournisseur'] - preview['Prix fournisseur origine'].fillna(0).astype(float)
-        )
-        preview['Ecart prix de vente'] = (
-            preview['Nouveau prix de vente'] - preview['Prix vente origine'].fillna(0).astype(float)
-        )
-        preview['Remise temporaire'] = preview['R.%'].apply(self._has_temporary_discount)
-        preview['A modifier'] = (
-            (preview['Ecart prix de vente'] < lower_bound)
-            | (preview['Ecart prix de vente'] > upper_bound)
-        )
-        preview.loc[
-            (preview['Ecart prix de vente'] < lower_bound)
-            & (preview['Remise temporaire']),
-            'A modifier'
-        ] = False
-        preview.loc[
-            preview[['SupplierInfo ID', 'Nouveau prix de vente']].isna().any(axis=1),
-            'A modifier'
-        ] = False
+        preview = self._price_preview(preview, lower_bound, upper_bound)
 
         columns = [
             'Article ID Odoo',
@@ -192,8 +654,40 @@ class OdooConnector:
         ]
         return preview[columns]
 
+    def _price_preview(self, preview: pd.DataFrame, lower_bound: float, upper_bound: float) -> pd.DataFrame:
+        """Calcule nouveaux couts, prix de vente, ecarts et lignes a modifier, par colonnes entieres."""
+        preview['Nouveau prix fournisseur'] = preview['PU Net'].astype(float)
+        preview['Ratio unite fournisseur'] = preview['Ratio unite fournisseur'].fillna(1).astype(float)
+        preview['Nouveau cout'] = (preview['Nouveau prix fournisseur'] * preview['Ratio unite fournisseur']).round(2)
+        preview['Nouveau prix de vente'] = self._compute_sale_prices(
+            preview['Nouveau cout'],
+            preview['Taxe vente montant'] if 'Taxe vente montant' in preview else None,
+            preview['Categorie marge'] if 'Categorie marge' in preview else None,
+        )
+        preview['Ecart prix fournisseur'] = (
+            preview['Nouveau prix fournisseur'] - preview['Prix fournisseur origine'].fillna(0).astype(float)
+        )
+        preview['Ecart prix de vente'] = (
+            preview['Nouveau prix de vente'] - preview['Prix vente origine'].fillna(0).astype(float)
+        )
+        preview['Remise temporaire'] = self._has_temporary_discounts(preview['R.%'])
+
+        # Hausse ou baisse hors des bornes, sauf baisse due a une remise temporaire
+        below = preview['Ecart prix de vente'] < lower_bound
+        above = preview['Ecart prix de vente'] > upper_bound
+        complete = preview[['SupplierInfo ID', 'Nouveau prix de vente']].notna().all(axis=1)
+        preview['A modifier'] = ((below & ~preview['Remise temporaire']) | above) & complete
+        return preview
+
     def update_prices_from_preview(self, preview: pd.DataFrame) -> dict:
-        """Met a jour les prix fournisseur, cout et prix de vente dans Odoo."""
+        """
+        Met a jour les prix fournisseur, cout et prix de vente dans Odoo.
+
+        Les lignes qui recoivent les memes valeurs sont ecrites par un seul appel
+        write sur plusieurs ids, et les appels sont envoyes en parallele. Un
+        appel groupe en echec est rejoue ligne a ligne pour attribuer l'erreur.
+        Comme avant, un article n'est modifie que si sa ligne fournisseur l'a ete.
+        """
         if not self.connected:
             raise ValueError("Non connecte a Odoo")
 
@@ -203,164 +697,188 @@ class OdooConnector:
 
         Product = self.odoo.env['product.product']
         SupplierInfo = self.odoo.env['product.supplierinfo']
-        details = []
-        success = 0
-        errors = 0
+        rows = [
+            (
+                self._coerce_int(row['Article ID Odoo']),
+                self._coerce_int(row['SupplierInfo ID']),
+                row,
+            )
+            for row in to_update.to_dict('records')
+        ]
 
-        for _, row in to_update.iterrows():
-            product_id = self._coerce_int(row['Article ID Odoo'])
-            supplierinfo_id = self._coerce_int(row['SupplierInfo ID'])
-            try:
-                SupplierInfo.write(
-                    [supplierinfo_id],
-                    {'price': float(row['Nouveau prix fournisseur'])}
-                )
-                Product.write(
-                    [product_id],
-                    {
+        with ThreadPoolExecutor(max_workers=Config.ODOO_MAX_WORKERS) as executor:
+            # Une ligne fournisseur partagee prend la derniere valeur, comme en ecriture ligne a ligne
+            supplier_errors = self._write_grouped(
+                executor,
+                SupplierInfo,
+                {
+                    supplierinfo_id: {'price': float(row['Nouveau prix fournisseur'])}
+                    for _, supplierinfo_id, row in rows
+                },
+            )
+            product_errors = self._write_grouped(
+                executor,
+                Product,
+                {
+                    product_id: {
                         'standard_price': float(row['Nouveau cout']),
                         'list_price': float(row['Nouveau prix de vente']),
                     }
-                )
-                success += 1
-                details.append({
-                    'Article ID Odoo': product_id,
-                    'Nom': row.get('Nom'),
-                    'Statut': 'OK',
-                    'Message': 'Prix mis a jour',
-                })
-            except Exception as e:
-                errors += 1
-                details.append({
-                    'Article ID Odoo': product_id,
-                    'Nom': row.get('Nom'),
-                    'Statut': 'Erreur',
-                    'Message': str(e),
-                })
-
-        return {'success': success, 'errors': errors, 'details': details}
-
-    def _get_external_ids(self, df_articles: pd.DataFrame) -> pd.DataFrame:
-        """Recupere les ID externes des articles."""
-        try:
-            IrModelData = self.odoo.env['ir.model.data']
-            external_ids_data = IrModelData.search_read(
-                [('model', '=', 'product.product')],
-                ['res_id', 'complete_name']
+                    for product_id, supplierinfo_id, row in rows
+                    if supplierinfo_id not in supplier_errors
+                },
             )
 
-            df_external_ids = pd.DataFrame(external_ids_data)
-            if not df_external_ids.empty:
-                df_external_ids.rename(columns={'complete_name': 'external_id'}, inplace=True)
-                df_articles = df_articles.merge(
-                    df_external_ids[['res_id', 'external_id']],
-                    left_on='id',
-                    right_on='res_id',
-                    how='left'
-                )
+        details = []
+        for product_id, supplierinfo_id, row in rows:
+            error = supplier_errors.get(supplierinfo_id) or product_errors.get(product_id)
+            details.append({
+                'Article ID Odoo': product_id,
+                'Nom': row.get('Nom'),
+                'Statut': 'OK' if error is None else 'Erreur',
+                'Message': 'Prix mis a jour' if error is None else error,
+            })
+
+        errors = sum(detail['Statut'] == 'Erreur' for detail in details)
+        return {'success': len(details) - errors, 'errors': errors, 'details': details}
+
+    @staticmethod
+    def _write_grouped(executor, model, values_by_id: dict) -> dict:
+        """
+        Ecrit des valeurs par id en regroupant les ids qui recoivent les memes valeurs.
+
+        Returns:
+            dict: id -> message d'erreur, pour les enregistrements non modifies
+        """
+        groups = {}
+        for record_id, values in values_by_id.items():
+            groups.setdefault(tuple(sorted(values.items())), []).append(record_id)
+
+        size = Config.ODOO_WRITE_BATCH_SIZE
+        futures = [
+            executor.submit(OdooConnector._write_batch, model, ids[start:start + size], dict(values))
+            for values, ids in groups.items()
+            for start in range(0, len(ids), size)
+        ]
+        errors = {}
+        for future in futures:
+            errors.update(future.result())
+        return errors
+
+    @staticmethod
+    def _write_batch(model, ids: list, values: dict) -> dict:
+        """Un appel write sur plusieurs ids, rejoue id par id en cas d'echec."""
+        try:
+            model.write(ids, values)
+            return {}
         except Exception as e:
-            st.warning(f"Impossible de recuperer les ID externes : {str(e)}")
+            if len(ids) == 1:
+                return {ids[0]: str(e)}
+
+        errors = {}
+        for record_id in ids:
+            try:
+                model.write([record_id], values)
+            except Exception as e:
+                errors[record_id] = str(e)
+        return errors
+
+    def _get_external_ids(self, df_articles: pd.DataFrame, df_external_ids: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Ajoute les ID externes des articles. Une variante a plusieurs ID
+        externes (__export__ et ID de module...) : le plus petit id
+        ir.model.data est retenu, une seule ligne par variante.
+        """
+        if df_external_ids is None:
             df_articles['external_id'] = None
+        elif not df_external_ids.empty:
+            df_external_ids = (
+                df_external_ids.sort_values('id', kind='stable')
+                .drop_duplicates('res_id')
+                .rename(columns={'complete_name': 'external_id'})
+            )
+            df_articles = df_articles.merge(
+                df_external_ids[['res_id', 'external_id']],
+                left_on='id',
+                right_on='res_id',
+                how='left'
+            )
 
         return df_articles
 
-    def _get_supplier_info(self, df_articles: pd.DataFrame) -> pd.DataFrame:
-        """Recupere les informations fournisseurs et l'unite d'achat."""
+    def _get_supplier_info(self, df_articles: pd.DataFrame, df_suppliers: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Ajoute l'unite d'achat : celle de la ligne fournisseur retenue pour la
+        variante (une seule par variante), a defaut l'unite d'achat de l'article.
+        """
         df_articles['template_id'] = df_articles['product_tmpl_id'].apply(self._many2one_id)
 
-        try:
-            SupplierInfo = self.odoo.env['product.supplierinfo']
-            suppliers_data = SupplierInfo.search_read(
-                [],
-                ['product_tmpl_id', 'product_id', 'product_uom']
+        if df_suppliers is not None and not df_suppliers.empty:
+            df_suppliers = pd.DataFrame({
+                'SupplierInfo ID': df_suppliers['id'],
+                'template_id': df_suppliers['product_tmpl_id'].apply(self._many2one_id),
+                'supplier_product_id': df_suppliers['product_id'].apply(self._many2one_id),
+                'uom_id': df_suppliers['product_uom'].apply(self._many2one_id),
+                'uom_name': df_suppliers['product_uom'].apply(self._many2one_name),
+            })
+            selected = self._select_supplier_lines_for_products(
+                df_articles, df_suppliers, columns=['uom_id', 'uom_name']
             )
-
-            df_suppliers = pd.DataFrame(suppliers_data)
-            if not df_suppliers.empty:
-                df_suppliers['template_id'] = df_suppliers['product_tmpl_id'].apply(self._many2one_id)
-                df_suppliers['uom_id'] = df_suppliers['product_uom'].apply(self._many2one_id)
-                df_suppliers['uom_name'] = df_suppliers['product_uom'].apply(self._many2one_name)
-
-                df_articles = df_articles.merge(
-                    df_suppliers[['template_id', 'uom_id', 'uom_name']],
-                    on='template_id',
-                    how='left'
-                )
-            else:
-                df_articles['uom_id'] = None
-                df_articles['uom_name'] = None
-
-        except Exception as e:
-            st.warning(f"Impossible de recuperer les infos fournisseurs : {str(e)}")
+            df_articles['uom_id'] = selected['uom_id'].to_numpy()
+            df_articles['uom_name'] = selected['uom_name'].to_numpy()
+        else:
             df_articles['uom_id'] = None
             df_articles['uom_name'] = None
 
-        df_articles['uom_id'] = df_articles.apply(
-            lambda row: row['uom_id'] if pd.notna(row.get('uom_id')) else self._many2one_id(row.get('uom_po_id')),
-            axis=1
+        df_articles['uom_id'] = df_articles['uom_id'].astype(object).combine_first(
+            df_articles['uom_po_id'].apply(self._many2one_id)
         )
-        df_articles['uom_name'] = df_articles.apply(
-            lambda row: row['uom_name'] if pd.notna(row.get('uom_name')) else self._many2one_name(row.get('uom_po_id')),
-            axis=1
+        df_articles['uom_name'] = df_articles['uom_name'].astype(object).combine_first(
+            df_articles['uom_po_id'].apply(self._many2one_name)
         )
 
         return df_articles
 
-    def _get_tax_info(self, df_articles: pd.DataFrame) -> pd.DataFrame:
-        """Recupere les taxes fournisseurs via product.template."""
-        try:
-            ProductTemplate = self.odoo.env['product.template']
-            template_ids = df_articles['template_id'].dropna().unique().tolist()
-
-            if not template_ids:
-                df_articles['tax_id'] = None
-                df_articles['tax_external_id'] = None
-                return df_articles
+    def _get_tax_info(
+        self,
+        df_articles: pd.DataFrame,
+        df_templates: Optional[pd.DataFrame],
+        df_tax_external: Optional[pd.DataFrame],
+    ) -> pd.DataFrame:
+        """Ajoute les taxes fournisseurs des modeles d'articles (product.template)."""
+        if df_templates is None or df_templates.empty:
+            df_articles['tax_id'] = None
+            df_articles['tax_external_id'] = None
+            return df_articles
 
-            templates_data = ProductTemplate.search_read(
-                [('id', 'in', template_ids)],
-                ['id', 'supplier_taxes_id']
-            )
+        df_templates = df_templates.copy()
+        df_templates['tax_id'] = df_templates['supplier_taxes_id'].apply(
+            lambda value: value[0] if value and len(value) > 0 else None
+        )
 
-            df_templates = pd.DataFrame(templates_data)
-            df_templates['tax_id'] = df_templates['supplier_taxes_id'].apply(
-                lambda value: value[0] if value and len(value) > 0 else None
+        if df_tax_external is not None and not df_tax_external.empty:
+            # Comme pour les articles : un seul ID externe par taxe
+            df_tax_external = (
+                df_tax_external.sort_values('id', kind='stable')
+                .drop_duplicates('res_id')
+                .rename(columns={'complete_name': 'tax_external_id'})
             )
-
-            IrModelData = self.odoo.env['ir.model.data']
-            tax_ids = df_templates['tax_id'].dropna().unique().tolist()
-            if tax_ids:
-                tax_external_ids = IrModelData.search_read(
-                    [('model', '=', 'account.tax'), ('res_id', 'in', tax_ids)],
-                    ['res_id', 'complete_name']
-                )
-
-                df_tax_external = pd.DataFrame(tax_external_ids)
-                if not df_tax_external.empty:
-                    df_tax_external.rename(columns={'complete_name': 'tax_external_id'}, inplace=True)
-                    df_templates = df_templates.merge(
-                        df_tax_external[['res_id', 'tax_external_id']],
-                        left_on='tax_id',
-                        right_on='res_id',
-                        how='left'
-                    )
-                else:
-                    df_templates['tax_external_id'] = None
-            else:
-                df_templates['tax_external_id'] = None
-
-            df_articles = df_articles.merge(
-                df_templates[['id', 'tax_id', 'tax_external_id']],
-                left_on='template_id',
-                right_on='id',
-                how='left',
-                suffixes=('', '_template')
+            df_templates = df_templates.merge(
+                df_tax_external[['res_id', 'tax_external_id']],
+                left_on='tax_id',
+                right_on='res_id',
+                how='left'
             )
+        else:
+            df_templates['tax_external_id'] = None
 
-        except Exception as e:
-            st.warning(f"Impossible de recuperer les taxes : {str(e)}")
-            df_articles['tax_id'] = None
-            df_articles['tax_external_id'] = None
+        df_articles = df_articles.merge(
+            df_templates[['id', 'tax_id', 'tax_external_id']],
+            left_on='template_id',
+            right_on='id',
+            how='left',
+            suffixes=('', '_template')
+        )
 
         return df_articles
 
@@ -395,20 +913,11 @@ class OdooConnector:
 
     def _get_price_update_article_details(self, product_ids: list[int], supplier_id: int) -> pd.DataFrame:
         """Recupere les donnees Odoo necessaires a la mise a jour des prix."""
-        Product = self.odoo.env['product.product']
-        products = Product.search_read(
-            [('id', 'in', product_ids)],
-            [
-                'id',
-                'name',
-                'standard_price',
-                'list_price',
-                'product_tmpl_id',
-                'taxes_id',
-                'margin_classification_id',
-            ],
+        records = self._run_plan(
+            lambda executor: self._fetch_price_update_records(executor, product_ids, supplier_id)
         )
-        df_products = pd.DataFrame(products)
+
+        df_products = pd.DataFrame(records['products'])
         if df_products.empty:
             return pd.DataFrame()
 
@@ -418,12 +927,7 @@ class OdooConnector:
             lambda value: value[0] if value and len(value) > 0 else None
         )
 
-        SupplierInfo = self.odoo.env['product.supplierinfo']
-        supplier_lines = SupplierInfo.search_read(
-            [('product_tmpl_id', 'in', df_products['template_id'].dropna().unique().tolist()), ('name', '=', supplier_id)],
-            ['id', 'product_tmpl_id', 'product_id', 'price', 'product_uom'],
-        )
-        df_suppliers = pd.DataFrame(supplier_lines)
+        df_suppliers = pd.DataFrame(records['suppliers'])
         if df_suppliers.empty:
             df_suppliers = pd.DataFrame(columns=['SupplierInfo ID', 'id', 'template_id', 'Prix fournisseur origine', 'uom_id'])
         else:
@@ -438,19 +942,13 @@ class OdooConnector:
             )
             df_suppliers = self._select_supplier_lines_for_products(df_products, df_suppliers)
 
-        Tax = self.odoo.env['account.tax']
-        tax_ids = df_products['tax_id'].dropna().unique().tolist()
-        if tax_ids:
-            tax_data = Tax.search_read([('id', 'in', tax_ids)], ['id', 'amount'])
-            df_taxes = pd.DataFrame(tax_data).rename(columns={'amount': 'Taxe vente montant'})
+        if records['taxes']:
+            df_taxes = pd.DataFrame(records['taxes']).rename(columns={'amount': 'Taxe vente montant'})
         else:
             df_taxes = pd.DataFrame(columns=['id', 'Taxe vente montant'])
 
-        Uom = self.odoo.env['uom.uom']
-        uom_ids = df_suppliers['uom_id'].dropna().unique().tolist()
-        if uom_ids:
-            uom_data = Uom.search_read([('id', 'in', uom_ids)], ['id', 'factor'])
-            df_uom = pd.DataFrame(uom_data).rename(columns={'factor': 'Ratio unite fournisseur'})
+        if records['uoms']:
+            df_uom = pd.DataFrame(records['uoms']).rename(columns={'factor': 'Ratio unite fournisseur'})
         else:
             df_uom = pd.DataFrame(columns=['id', 'Ratio unite fournisseur'])
 
@@ -482,71 +980,115 @@ class OdooConnector:
             }
         )
 
+    def _fetch_price_update_records(self, executor, product_ids: list[int], supplier_id: int) -> dict:
+        """
+        Variantes, puis en meme temps lignes du fournisseur et taxes de vente,
+        puis unites de mesure des lignes fournisseurs.
+        """
+        products = executor.call('product.product', 'search_read', [('id', 'in', product_ids)], self.PRICE_PRODUCT_FIELDS)
+        records = {'products': products, 'suppliers': [], 'taxes': [], 'uoms': []}
+        if not products:
+            return records
+
+        template_ids = sorted({self._many2one_id(product['product_tmpl_id']) for product in products} - {None})
+        suppliers = executor.submit(
+            'product.supplierinfo', 'search_read',
+            [('product_tmpl_id', 'in', template_ids), ('name', '=', supplier_id)],
+            self.PRICE_SUPPLIER_FIELDS,
+        )
+        tax_ids = sorted({product['taxes_id'][0] for product in products if product.get('taxes_id')})
+        taxes = executor.submit('account.tax', 'search_read', [('id', 'in', tax_ids)], ['id', 'amount']) if tax_ids else None
+        records['suppliers'] = suppliers.result()
+        if taxes is not None:
+            records['taxes'] = taxes.result()
+        uom_ids = sorted({self._many2one_id(line['product_uom']) for line in records['suppliers']} - {None})
+        if uom_ids:
+            records['uoms'] = executor.call('uom.uom', 'search_read', [('id', 'in', uom_ids)], ['id', 'factor'])
+        return records
+
     def _select_supplier_lines_for_products(
         self,
         df_products: pd.DataFrame,
         df_suppliers: pd.DataFrame,
+        columns: list = None,
     ) -> pd.DataFrame:
-        """Choisit une seule ligne fournisseur par variante produit."""
-        selected_rows = []
-
-        for _, product in df_products[['id', 'template_id']].iterrows():
-            product_id = self._coerce_int(product['id'])
-            template_id = self._coerce_int(product['template_id'])
-            candidates = df_suppliers[df_suppliers['template_id'] == template_id].copy()
-
-            if candidates.empty:
-                selected_rows.append({
-                    'id': product_id,
-                    'SupplierInfo ID': None,
-                    'Prix fournisseur origine': None,
-                    'uom_id': None,
-                })
-                continue
-
-            variant_candidates = candidates[candidates['supplier_product_id'] == product_id]
-            generic_candidates = candidates[candidates['supplier_product_id'].isna()]
-
-            if not variant_candidates.empty:
-                selected = variant_candidates.sort_values('SupplierInfo ID').iloc[0]
-            elif not generic_candidates.empty:
-                selected = generic_candidates.sort_values('SupplierInfo ID').iloc[0]
-            else:
-                selected = candidates.sort_values('SupplierInfo ID').iloc[0]
-
-            selected_rows.append({
-                'id': product_id,
-                'SupplierInfo ID': selected['SupplierInfo ID'],
-                'Prix fournisseur origine': selected['Prix fournisseur origine'],
-                'uom_id': selected['uom_id'],
-            })
+        """
+        Choisit une seule ligne fournisseur par variante produit.
+
+        Parmi les lignes du modele de la variante, priorite a la ligne propre a
+        la variante, puis a une ligne generique (sans variante), puis a toute
+        autre ligne ; a priorite egale, le plus petit id. Un seul tri et un
+        dedoublonnage sur toute la table, au lieu d'un filtrage par variante.
+        """
+        products = pd.DataFrame({
+            'id': df_products['id'].map(self._coerce_int),
+            'template_id': df_products['template_id'].map(self._coerce_int),
+        }).reset_index(drop=True)
+        products['_row'] = range(len(products))
+
+        columns = columns or ['SupplierInfo ID', 'Prix fournisseur origine', 'uom_id']
+        suppliers = df_suppliers[
+            ['template_id', 'supplier_product_id'] + list(dict.fromkeys(['SupplierInfo ID'] + columns))
+        ].dropna(subset=['template_id'])
+        candidates = products.dropna(subset=['template_id']).astype({'template_id': 'int64'}).merge(
+            suppliers.astype({'template_id': 'int64'}),
+            on='template_id',
+            how='inner',
+        )
+        supplier_product = pd.to_numeric(candidates['supplier_product_id'], errors='coerce')
+        candidates['_priority'] = np.where(
+            supplier_product == candidates['id'], 0, np.where(supplier_product.isna(), 1, 2)
+        )
+        selected = (
+            candidates.sort_values(['_row', '_priority', 'SupplierInfo ID'], kind='stable')
+            .drop_duplicates('_row')
+        )
 
-        return pd.DataFrame(selected_rows)
+        result = products[['_row', 'id']].merge(selected[['_row'] + columns], on='_row', how='left')
+        return result[['id'] + columns]
+
+    @classmethod
+    def _margin_table(cls) -> pd.DataFrame:
+        """Taux de marge et consigne de chaque categorie de MARGIN_RATES, calcules une fois."""
+        cached = cls._compiled_margins
+        if cached is None or cached[0] is not cls.MARGIN_RATES:
+            names = list(cls.MARGIN_RATES)
+            deposits = [
+                float(name.split(" ")[-1].replace("€", ".").replace(",", ".")) if "Consigne" in name else 0.0
+                for name in names
+            ]
+            table = pd.DataFrame(
+                {'rate': list(cls.MARGIN_RATES.values()), 'deposit': deposits},
+                index=pd.Index(names, dtype=object),
+                dtype=float,
+            )
+            cached = cls._compiled_margins = (cls.MARGIN_RATES, table)
+        return cached[1]
 
-    def _compute_sale_price(self, cost, tax_amount, margin_name):
-        """Calcule le prix de vente a partir du cout, de la taxe et de la marge."""
-        if pd.isna(cost) or pd.isna(tax_amount) or not margin_name:
-            return None
-        if margin_name not in self.MARGIN_RATES:
-            return None
+    def _compute_sale_prices(self, cost: pd.Series, tax_amount, margin_name) -> pd.Series:
+        """
+        Calcule les prix de vente a partir du cout, de la taxe et de la categorie de marge.
 
-        margin_rate = self.MARGIN_RATES[margin_name]
-        sale_price = float(cost) * (1 + margin_rate / 100) * (1 + float(tax_amount) / 100)
+        NaN si le cout ou la taxe manque, ou si la categorie n'est pas dans MARGIN_RATES.
+        """
+        if tax_amount is None or margin_name is None:
+            return pd.Series(np.nan, index=cost.index)
 
-        if "Consigne" in margin_name:
-            deposit_text = margin_name.split(" ")[-1].replace("€", ".").replace(",", ".")
-            sale_price += float(deposit_text)
+        margins = self._margin_table().reindex(margin_name.astype(object).where(margin_name.notna(), None))
+        rate = margins['rate'].to_numpy()
+        deposit = margins['deposit'].to_numpy()
+        cost = pd.to_numeric(cost, errors='coerce').to_numpy(dtype=float)
+        tax = pd.to_numeric(tax_amount, errors='coerce').to_numpy(dtype=float)
 
-        return round(sale_price, 2)
+        sale_price = cost * (1 + rate / 100) * (1 + tax / 100) + deposit
+        return pd.Series(np.round(sale_price, 2), index=margin_name.index)
 
     @staticmethod
-    def _has_temporary_discount(value) -> bool:
-        if pd.isna(value):
-            return False
-        try:
-            return float(str(value).replace(',', '.').strip() or 0) > 0
-        except ValueError:
-            return bool(str(value).strip())
+    def _has_temporary_discounts(values: pd.Series) -> pd.Series:
+        """True pour les remises renseignees : nombre positif, ou texte non numerique."""
+        text = values.astype(object).where(values.notna(), '').astype(str).str.replace(',', '.').str.strip()
+        numbers = pd.to_numeric(text.replace('', '0'), errors='coerce')
+        return ((numbers > 0) | (numbers.isna() & (text != ''))) & values.notna()
 
     def _prepare_purchase_order_line(self, row: pd.Series) -> dict:
         """Prepare les valeurs d'une ligne de demande de prix."""
@@ -644,6 +1186,9 @@ class OdooConnector:
             return None
 
     def disconnect(self):
-        """Ferme la connexion Odoo."""
+        """Ferme la connexion Odoo (la rend au pool le cas echeant)."""
+        if self.pool is not None:
+            self.pool.release(self)
+        self._close_async_rpc()
         self.odoo = None
         self.connected = False
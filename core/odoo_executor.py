@@ -0,0 +1,79 @@
+"""
+Executeurs des appels Odoo.
+
+Les plans de requetes d'OdooConnector (catalogue, articles d'une facture,
+mise a jour des prix) sont ecrits une seule fois et soumettent leurs appels
+a un executeur : submit(modele, methode, *args, **kwargs) retourne un
+concurrent.futures.Future, quel que soit le transport.
+
+- OdoorpcExecutor : appels odoorpc sur un pool de threads borne.
+- AsyncOdooExecutor : AsyncOdooClient sur une boucle asyncio dediee ; les
+  appels partagent une session HTTP keep-alive conservee entre les plans.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import Config
+from .odoo_async import AsyncOdooClient
+
+
+class OdoorpcExecutor:
+    """Appels d'une connexion odoorpc executes sur un pool de threads."""
+
+    def __init__(self, odoo, max_workers: int = None):
+        self.odoo = odoo
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or Config.ODOO_MAX_WORKERS)
+        self._models = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, model: str, method: str, *args, **kwargs):
+        # Modele instancie dans le thread appelant (chargement des champs par odoorpc)
+        if model not in self._models:
+            self._models[model] = self.odoo.env[model]
+        return self._pool.submit(getattr(self._models[model], method), *args, **kwargs)
+
+    def call(self, model: str, method: str, *args, **kwargs):
+        return self.submit(model, method, *args, **kwargs).result()
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class AsyncOdooExecutor:
+    """AsyncOdooClient sur une boucle asyncio dediee, appele depuis du code synchrone."""
+
+    def __init__(self, url: str, port: int, protocol: str = 'jsonrpc+ssl', max_concurrency: int = None):
+        self.client = AsyncOdooClient(url, port, protocol, max_concurrency=max_concurrency)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='odoo-jsonrpc', daemon=True)
+        self._thread.start()
+
+    def authenticate(self, database: str, username: str, password: str) -> int:
+        return asyncio.run_coroutine_threadsafe(
+            self.client.authenticate(database, username, password), self.loop
+        ).result()
+
+    def submit(self, model: str, method: str, *args, **kwargs):
+        return asyncio.run_coroutine_threadsafe(self.client.execute_kw(model, method, args, kwargs), self.loop)
+
+    def call(self, model: str, method: str, *args, **kwargs):
+        return self.submit(model, method, *args, **kwargs).result()
+
+    def close(self):
+        """Ferme la session HTTP puis arrete la boucle (sans effet si deja fermee)."""
+        if self.loop.is_closed():
+            return
+        if self._thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result(timeout=10)
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join(timeout=10)
+        if not self.loop.is_running():
+            self.loop.close()
@@ -0,0 +1,195 @@
+"""
+Pool de connexions Odoo authentifiees.
+
+Une connexion odoorpc (ODOO + login) coute plusieurs allers-retours. Le pool
+conserve les connexions deja authentifiees, par serveur, base et utilisateur,
+et les prete a un seul proprietaire a la fois (en general l'OdooConnector
+d'une session Streamlit) : deux sessions n'utilisent jamais la meme connexion
+en meme temps. Une connexion revient au pool quand son proprietaire la rend
+ou disparait, et les connexions inutilisees depuis trop longtemps sont
+fermees. Une connexion reprise est d'abord verifiee par un appel leger ; si
+sa session a expire (serveur redemarre...), une nouvelle authentification
+la remplace.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+import weakref
+
+import odoorpc
+
+from .config import Config
+
+
+class _PooledConnection:
+    """Connexion authentifiee et son etat dans le pool."""
+
+    def __init__(self, key, odoo, password_digest):
+        self.key = key
+        self.odoo = odoo
+        self.password_digest = password_digest
+        self.owner = None
+        self.finalizer = None
+        self.last_used = time.monotonic()
+
+
+class OdooConnectionPool:
+    """Connexions odoorpc authentifiees, pretees a un proprietaire a la fois."""
+
+    def __init__(self, idle_seconds: float = None, max_idle: int = None, protocol: str = 'jsonrpc+ssl'):
+        """
+        Args:
+            idle_seconds (float): Duree apres laquelle une connexion libre est fermee
+            max_idle (int): Connexions libres conservees par serveur, base et utilisateur
+            protocol (str): Protocole odoorpc
+        """
+        self.idle_seconds = Config.ODOO_POOL_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.max_idle = Config.ODOO_POOL_MAX_IDLE if max_idle is None else max_idle
+        self.protocol = protocol
+        # Reentrant : une session detruite rend sa connexion depuis le ramasse-miettes
+        self._lock = threading.RLock()
+        self._idle = {}
+        self._leases = {}
+        # Les mots de passe ne sont conserves que sous forme d'empreinte
+        self._secret = os.urandom(32)
+
+    def checkout(self, owner, url: str, port: int, database: str, username: str, password: str):
+        """
+        Prete a owner une connexion authentifiee, reutilisee si possible.
+
+        Un proprietaire ne detient qu'une connexion : s'il en detient deja une
+        pour les memes identifiants, elle est retournee telle quelle ; sinon
+        elle est rendue au pool. Une connexion reprise (pretee ou libre) qui ne
+        repond plus est abandonnee et remplacee par une nouvelle
+        authentification. La connexion revient au pool a release(owner) ou
+        quand owner est detruit.
+
+        Returns:
+            odoorpc.ODOO: Connexion authentifiee
+
+        Raises:
+            Exception: Erreur de connexion ou d'authentification d'odoorpc
+        """
+        key = (str(url), int(port), str(database), str(username))
+        digest = self._digest(password)
+
+        with self._lock:
+            self._evict_idle()
+            current = self._leases.get(id(owner))
+            if current is not None and not (current.key == key and hmac.compare_digest(current.password_digest, digest)):
+                self._release(current)
+                current = None
+            entry = current if current is not None else self._take_idle(key, digest)
+
+        # Verification hors du verrou : un serveur lent ne bloque pas les autres sessions
+        if entry is not None and not self._is_alive(entry.odoo):
+            if entry is current:
+                with self._lock:
+                    self._forget(current)
+                current = None
+            entry = None
+
+        if entry is not None and entry is current:
+            with self._lock:
+                current.last_used = time.monotonic()
+            return current.odoo
+
+        if entry is None:
+            # Nouvelle authentification, hors du verrou : les autres sessions ne l'attendent pas
+            odoo = odoorpc.ODOO(url, port=port, protocol=self.protocol)
+            odoo.login(database, username, password)
+            entry = _PooledConnection(key, odoo, digest)
+
+        with self._lock:
+            entry.owner = id(owner)
+            entry.last_used = time.monotonic()
+            entry.finalizer = weakref.finalize(owner, self._release_abandoned, entry)
+            self._leases[id(owner)] = entry
+        return entry.odoo
+
+    def release(self, owner):
+        """Rend au pool la connexion detenue par owner."""
+        with self._lock:
+            entry = self._leases.get(id(owner))
+            if entry is not None:
+                self._release(entry)
+            self._evict_idle()
+
+    def evict_idle(self) -> int:
+        """Ferme les connexions libres inutilisees depuis idle_seconds ; retourne leur nombre."""
+        with self._lock:
+            return self._evict_idle()
+
+    def stats(self) -> dict:
+        """Nombre de connexions pretees et libres."""
+        with self._lock:
+            return {
+                'pretees': len(self._leases),
+                'libres': sum(len(entries) for entries in self._idle.values()),
+            }
+
+    def clear(self):
+        """Oublie toutes les connexions libres (les connexions pretees restent valides)."""
+        with self._lock:
+            self._idle.clear()
+
+    @staticmethod
+    def _is_alive(odoo) -> bool:
+        """Session toujours valide : lecture de l'utilisateur connecte (un seul appel)."""
+        try:
+            odoo.env['res.users'].read([odoo.env.uid], ['id'])
+            return True
+        except Exception:
+            return False
+
+    def _forget(self, entry):
+        """Retire une connexion pretee hors d'usage, sans la rendre au pool."""
+        if entry.finalizer is not None:
+            entry.finalizer.detach()
+            entry.finalizer = None
+        self._leases.pop(entry.owner, None)
+        entry.owner = None
+
+    def _digest(self, password) -> bytes:
+        return hmac.new(self._secret, str(password).encode('utf-8'), hashlib.sha256).digest()
+
+    def _take_idle(self, key, digest):
+        entries = self._idle.get(key, [])
+        for position in range(len(entries) - 1, -1, -1):
+            if hmac.compare_digest(entries[position].password_digest, digest):
+                return entries.pop(position)
+        return None
+
+    def _release(self, entry):
+        if entry.finalizer is not None:
+            entry.finalizer.detach()
+            entry.finalizer = None
+        self._leases.pop(entry.owner, None)
+        entry.owner = None
+        entry.last_used = time.monotonic()
+        entries = self._idle.setdefault(entry.key, [])
+        entries.append(entry)
+        # Au-dela de max_idle, les connexions les plus anciennes sont fermees
+        if len(entries) > self.max_idle:
+            del entries[:len(entries) - self.max_idle]
+
+    def _release_abandoned(self, entry):
+        """Proprietaire detruit (session terminee) : la connexion revient au pool."""
+        with self._lock:
+            if self._leases.get(entry.owner) is entry:
+                entry.finalizer = None
+                self._release(entry)
+
+    def _evict_idle(self) -> int:
+        limit = time.monotonic() - self.idle_seconds
+        evicted = 0
+        for key in list(self._idle):
+            kept = [entry for entry in self._idle[key] if entry.last_used >= limit]
+            evicted += len(self._idle[key]) - len(kept)
+            if kept:
+                self._idle[key] = kept
+            else:
+                del self._idle[key]
+        return evicted
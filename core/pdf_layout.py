@@ -0,0 +1,57 @@
+"""
+Index de mise en page d'une page PDF.
+
+Les mots sont tries une seule fois par ordonnee : chaque bande de ligne est
+ensuite retrouvee par recherche dichotomique au lieu d'un parcours complet de
+la page. Les abscisses sont affectees aux colonnes en une seule passe
+vectorisee contre les bornes de COLUMN_BOUNDS.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+
+class PageLayout:
+    """Mots d'une page tries par (y0, x0) et deja affectes a leur colonne."""
+
+    def __init__(self, words, column_bounds):
+        # Le tri stable conserve l'ordre du PDF pour les mots de meme position,
+        # comme le tri par bande de l'extraction d'origine.
+        self.columns = list(column_bounds)
+        self.words = sorted(words, key=lambda word: (word[1], word[0]))
+        self.y0 = [word[1] for word in self.words]
+        self.column_index = self._bin_columns(column_bounds)
+
+    def _bin_columns(self, column_bounds):
+        """
+        Retourne l'indice de colonne de chaque mot (-1 hors colonnes).
+
+        Les bornes sont supposees disjointes : un mot appartient a la colonne
+        dont l'intervalle [gauche, droite[ contient son abscisse x0.
+        """
+        bounds = np.array(list(column_bounds.values()), dtype=float).reshape(-1, 2)
+        order = np.argsort(bounds[:, 0], kind='stable')
+        lefts = bounds[order, 0]
+        rights = bounds[order, 1]
+
+        x0 = np.fromiter((word[0] for word in self.words), dtype=float, count=len(self.words))
+        candidates = np.searchsorted(lefts, x0, side='right') - 1
+        safe_candidates = np.clip(candidates, 0, None)
+        inside = (candidates >= 0) & (x0 < rights[safe_candidates])
+
+        return np.where(inside, order[safe_candidates], -1).tolist()
+
+    def band_row(self, y_min, y_max):
+        """Construit la ligne des mots dont l'ordonnee y0 est dans [y_min, y_max[."""
+        start = bisect_left(self.y0, y_min)
+        stop = bisect_left(self.y0, y_max, lo=start)
+        texts = [[] for _ in self.columns]
+
+        for word, column in zip(self.words[start:stop], self.column_index[start:stop]):
+            if column >= 0:
+                texts[column].append(word[4])
+
+        return {
+            column: " ".join(column_texts).strip()
+            for column, column_texts in zip(self.columns, texts)
+        }
@@ -5,12 +5,17 @@ Les factures Relais Local sont des PDF texte avec une mise en page stable.
 On reconstruit donc les lignes depuis les coordonnees des mots plutot que via
 une detection automatique de tableau, trop sensible aux colonnes fusionnees.
 """
+import math
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 import fitz  # PyMuPDF
 import pandas as pd
 
 from .config import Config
+from .disk_cache import content_key
+from .pdf_layout import PageLayout
 
 
 class PDFProcessor:
@@ -18,6 +23,17 @@ class PDFProcessor:
 
     PRODUCT_REF_PATTERN = re.compile(r"^\d{6}$")
 
+    # A incrementer a chaque changement de l'extraction ou du nettoyage des
+    # lignes : invalide les entrees du cache des factures deja analysees.
+    PARSER_VERSION = 2
+
+    # Les lignes d'articles commencent sous cette ordonnee (en-tete de facture au-dessus)
+    TABLE_TOP_Y = 230
+
+    # Extraction rapide : ni ligatures ni espaces speciaux preserves, pas d'images.
+    # Les mots restent decoupes sur les espaces comme avec les options par defaut.
+    FAST_TEXT_FLAGS = fitz.TEXT_MEDIABOX_CLIP | fitz.TEXT_CID_FOR_UNKNOWN_UNICODE
+
     # Bornes horizontales observees sur les factures Relais Local.
     # Les colonnes non utilisees plus tard sont conservees pour faciliter le debug.
     COLUMN_BOUNDS = {
@@ -38,7 +54,7 @@ class PDFProcessor:
     def __init__(self):
         self.config = Config()
 
-    def extract_tables_from_pdf(self, pdf_path):
+    def extract_tables_from_pdf(self, pdf_source, parallel=False, workers=None, fast=None):
         """
         Extrait les lignes d'articles du PDF et retourne une liste de DataFrames.
 
@@ -48,25 +64,121 @@ class PDFProcessor:
         - la reference produit a gauche sert d'ancre de ligne ;
         - la ligne s'etend jusqu'a la reference suivante ;
         - les valeurs sont affectees aux colonnes par zones horizontales.
-        """
-        df_list = []
 
-        with fitz.open(pdf_path) as pdf_document:
-            for page_num, page in enumerate(pdf_document, start=1):
-                page_df = self._extract_invoice_lines_from_page(page, page_num)
-                if not page_df.empty:
-                    df_list.append(page_df)
+        pdf_source peut etre un chemin, des octets, un memoryview ou un objet
+        fichier (UploadedFile Streamlit) : le PDF est alors lu en memoire, sans
+        fichier temporaire.
+
+        Avec parallel=True, les grosses factures sont decoupees en plages de
+        pages traitees par des processus separes (voir _iter_in_processes).
+        fast (par defaut Config.PDF_FAST_EXTRACTION) limite l'extraction du texte
+        a la zone du tableau (voir _extract_page_words).
+        """
+        df_list = list(self.iter_tables_from_pdf(pdf_source, parallel, workers, fast))
 
         if not df_list:
             raise ValueError("Aucune ligne article trouvee dans le PDF")
 
         return df_list
 
-    def _extract_invoice_lines_from_page(self, page, page_num):
+    def iter_tables_from_pdf(self, pdf_source, parallel=False, workers=None, fast=None):
+        """
+        Version en flux de extract_tables_from_pdf.
+
+        Produit le DataFrame de chaque page (non vide) des qu'il est extrait, dans
+        l'ordre des pages, sans conserver les pages precedentes. Ne leve pas
+        d'erreur si le PDF ne contient aucune ligne : le flux est simplement vide.
+        """
+        pdf_source = self._as_pdf_buffer(pdf_source)
+        if fast is None:
+            fast = self.config.PDF_FAST_EXTRACTION
+
+        with self.open_document(pdf_source) as pdf_document:
+            page_count = pdf_document.page_count
+            workers = self._resolve_workers(page_count, workers) if parallel else 1
+            if workers <= 1:
+                yield from self._iter_page_range(pdf_document, 0, page_count, fast)
+                return
+
+        yield from self._iter_in_processes(pdf_source, page_count, workers, fast)
+
+    @staticmethod
+    def open_document(pdf_source):
+        """Ouvre un PDF depuis un chemin, des octets, un memoryview ou un objet fichier."""
+        if isinstance(pdf_source, (str, os.PathLike)):
+            return fitz.open(pdf_source)
+        return fitz.open(stream=PDFProcessor._as_pdf_buffer(pdf_source), filetype='pdf')
+
+    @staticmethod
+    def _as_pdf_buffer(pdf_source):
+        """Remplace un objet fichier par son contenu ; chemins et octets inchanges."""
+        if hasattr(pdf_source, 'getbuffer'):
+            # BytesIO / UploadedFile : vue directe sur le tampon, sans copie
+            return pdf_source.getbuffer()
+        if hasattr(pdf_source, 'read'):
+            return pdf_source.read()
+        return pdf_source
+
+    def cache_key(self, pdf_bytes):
+        """Cle de cache d'une facture : contenu du PDF + version du parseur."""
+        return content_key(
+            pdf_bytes,
+            str(self.PARSER_VERSION),
+            repr(sorted(self.COLUMN_BOUNDS.items())),
+            str(bool(self.config.PDF_FAST_EXTRACTION)),
+        )
+
+    def _resolve_workers(self, page_count, workers=None):
+        """Nombre de processus a utiliser, 1 si la facture est trop petite."""
+        if page_count < self.config.PDF_PARALLEL_MIN_PAGES:
+            return 1
+
+        workers = workers or self.config.PDF_PARALLEL_WORKERS or os.cpu_count() or 1
+        return max(1, min(int(workers), page_count))
+
+    def _iter_in_processes(self, pdf_source, page_count, workers, fast=False):
+        """
+        Repartit les pages entre plusieurs processus.
+
+        Chaque processus ouvre son propre document et renvoie les DataFrames de
+        sa plage ; executor.map conserve l'ordre des plages, donc des pages.
+        On decoupe en plus de plages que de processus pour lisser la charge.
+        Un PDF en memoire est transmis aux processus sous forme d'octets.
+        """
+        if not isinstance(pdf_source, (str, os.PathLike, bytes)):
+            pdf_source = bytes(pdf_source)
+
+        range_size = max(1, math.ceil(page_count / (workers * 4)))
+        starts = list(range(0, page_count, range_size))
+        stops = [min(start + range_size, page_count) for start in starts]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _extract_page_range_worker,
+                [pdf_source] * len(starts),
+                starts,
+                stops,
+                [fast] * len(starts),
+            )
+            for range_dfs in results:
+                yield from range_dfs
+
+    def _iter_page_range(self, pdf_document, start, stop, fast=False):
+        """Extrait les pages [start, stop[ d'un document deja ouvert."""
+        for page_index in range(start, stop):
+            page_df = self._extract_invoice_lines_from_page(pdf_document[page_index], page_index + 1, fast)
+            if not page_df.empty:
+                yield page_df
+
+    def _extract_invoice_lines_from_page(self, page, page_num, fast=False):
         """Reconstruit les lignes d'articles d'une page depuis les mots positionnes."""
-        words = page.get_text("words")
+        words = self._extract_page_words(page, fast)
         line_anchors = self._find_line_anchors(words)
+        if not line_anchors:
+            return pd.DataFrame()
+
         footer_y = self._find_footer_y(words, page.rect.height)
+        layout = PageLayout(words, self.COLUMN_BOUNDS)
         rows = []
 
         for index, (line_y, ref) in enumerate(line_anchors):
@@ -75,17 +187,29 @@ class PDFProcessor:
                 if index + 1 < len(line_anchors)
                 else min(footer_y, line_y + 45)
             )
-            band_words = [
-                word for word in words
-                if line_y - 2 <= word[1] < next_line_y - 1
-            ]
-            row = self._words_to_row(band_words)
+            row = layout.band_row(line_y - 2, next_line_y - 1)
             row['REF.'] = ref
             row['Page'] = page_num
             rows.append(row)
 
         return pd.DataFrame(rows)
 
+    def _extract_page_words(self, page, fast=False):
+        """
+        Retourne les mots positionnes de la page.
+
+        En mode rapide, une seule TextPage est construite, limitee a la bande
+        situee sous l'en-tete : MuPDF ignore alors les caracteres hors zone
+        au lieu de les extraire pour les filtrer ensuite. La marge sous
+        TABLE_TOP_Y couvre la tolerance de 2 points des bandes de lignes.
+        """
+        if not fast:
+            return page.get_text("words")
+
+        table_rect = fitz.Rect(page.rect.x0, self.TABLE_TOP_Y - 12, page.rect.x1, page.rect.y1)
+        textpage = page.get_textpage(clip=table_rect, flags=self.FAST_TEXT_FLAGS)
+        return page.get_text("words", textpage=textpage)
+
     def _find_line_anchors(self, words):
         """Trouve les references articles qui ancrent les lignes du tableau."""
         anchors = []
@@ -93,7 +217,7 @@ class PDFProcessor:
         for word in words:
             x0, y0, _, _, text, *_ = word
             if (
-                y0 > 230
+                y0 > self.TABLE_TOP_Y
                 and x0 < self.COLUMN_BOUNDS['REF.'][1]
                 and self.PRODUCT_REF_PATTERN.match(text)
             ):
@@ -107,21 +231,13 @@ class PDFProcessor:
 
         for word in words:
             _, y0, _, _, text, *_ = word
-            if y0 > 230 and text in {'IBAN:', 'CONDITIONS', 'Clauses'}:
+            if y0 > self.TABLE_TOP_Y and text in {'IBAN:', 'CONDITIONS', 'Clauses'}:
                 footer_markers.append(y0)
 
         return min(footer_markers) if footer_markers else page_height
 
-    def _words_to_row(self, words):
-        """Affecte les mots d'une bande de ligne aux colonnes attendues."""
-        row = {}
-
-        for column, (left, right) in self.COLUMN_BOUNDS.items():
-            column_words = [
-                word for word in words
-                if left <= word[0] < right
-            ]
-            column_words = sorted(column_words, key=lambda word: (word[1], word[0]))
-            row[column] = " ".join(word[4] for word in column_words).strip()
 
-        return row
+def _extract_page_range_worker(pdf_source, start, stop, fast=False):
+    """Point d'entree des processus d'extraction : ouvre sa propre copie du PDF."""
+    with PDFProcessor.open_document(pdf_source) as pdf_document:
+        return list(PDFProcessor()._iter_page_range(pdf_document, start, stop, fast))
@@ -0,0 +1,224 @@
+"""
+Traitement complet d'une facture, sans interface.
+
+InvoicePipeline enchaine extraction PDF -> nettoyage -> fusion avec les
+articles -> preparation du fichier d'import (puis suggestions et exports), en
+mesurant chaque etape et en publiant l'avancement sur un EventBus. La meme
+API sert a l'application Streamlit, aux traitements par lots et aux
+benchmarks.
+"""
+import os
+
+import pandas as pd
+
+from .config import Config
+from .correspondance_index import CorrespondanceIndex
+from .data_processor import DataProcessor
+from .events import EventBus
+from .file_exporter import FileExporter
+from .instrumentation import StageProfiler
+from .pdf_processor import PDFProcessor
+
+
+class InvoicePipeline:
+    """Chaine de traitement d'une facture Relais Local en commande ODOO."""
+
+    def __init__(self, events=None, extraction_cache=None, correspondance_cache=None,
+                 pdf_processor=None, data_processor=None, file_exporter=None):
+        """
+        Args:
+            events (EventBus): Bus des messages de progression (un nouveau par defaut)
+            extraction_cache (DiskCache): Cache des lignes de factures deja analysees
+            correspondance_cache (DiskCache): Cache des fichiers de correspondance analyses
+            pdf_processor, data_processor, file_exporter: Composants a reutiliser
+        """
+        self.config = Config()
+        self.events = events or EventBus()
+        self.extraction_cache = extraction_cache
+        self.pdf_processor = pdf_processor or PDFProcessor()
+        self.data_processor = data_processor or DataProcessor(correspondance_cache, self.events)
+        self.file_exporter = file_exporter or FileExporter()
+
+    def run(self, pdf_source, articles_data, correspondance, ref_commande=None, id_fourni=None,
+            name=None, profiler=None, suggestions=True, export=True):
+        """
+        Traite une facture.
+
+        Args:
+            pdf_source: Chemin, octets ou objet fichier (UploadedFile Streamlit) du PDF
+            articles_data: DataFrame ou CSV des articles, ArticleIndex, ou fournisseur
+                de catalogue : fonction recevant les noms ODOO de la facture et
+                retournant le DataFrame de ces seuls articles (voir
+                OdooConnector.get_catalog_for_names)
+            correspondance: Fichier Excel de correspondance ou CorrespondanceIndex
+            ref_commande (str): Référence de la commande (Config par défaut)
+            id_fourni (str): ID externe du fournisseur (Config par défaut)
+            name (str): Nom de la facture (déduit du fichier par défaut)
+            profiler (StageProfiler): Mesure des étapes (sans journal par défaut)
+            suggestions (bool): Calculer les suggestions pour les articles non liés
+                (sans effet avec un fournisseur de catalogue : les articles de la
+                seule facture ne sont pas des candidats representatifs)
+            export (bool): Générer les fichiers Excel et CSV
+
+        Returns:
+            dict: df_processed, df_unlinked_rl, df_unlinked_od, df_import,
+                df_suggestions, pdf_name, ref_commande, id_fourni, excel_bytes,
+                csv_bytes et stage_timings
+
+        Raises:
+            ValueError: Si aucune ligne article n'est extraite du PDF, ou si le
+                fournisseur de catalogue echoue
+        """
+        ref_commande = ref_commande or self.config.REF_COMMANDE_DEFAULT
+        id_fourni = id_fourni or self.config.ID_FOURNI_DEFAULT
+        name = name or self.invoice_name(pdf_source)
+        profiler = profiler or StageProfiler(trace_memory=False, context={'facture': name})
+        try:
+            return self._process(pdf_source, articles_data, correspondance, ref_commande, id_fourni,
+                                 name, profiler, suggestions, export)
+        finally:
+            # tracemalloc est global au processus : libéré dès la fin du traitement
+            profiler.close()
+
+    def _process(self, pdf_source, articles_data, correspondance, ref_commande, id_fourni,
+                 name, profiler, suggestions, export):
+        """
+        Corps de run. Les lignes passent lot par lot (une page à la fois) de
+        l'extraction à la fusion, à la préparation de l'import et aux exports.
+        Les tableaux complets ne sont assemblés qu'une fois, pour les résultats
+        retournés et les suggestions, qui portent sur toute la facture.
+        """
+        pdf_data = self._read_pdf(pdf_source)
+        clean_batches = self._clean_line_batches(pdf_data, profiler)
+
+        if callable(articles_data):
+            if suggestions:
+                self.events.info("Suggestions d'articles indisponibles : seuls les articles de la facture sont récupérés")
+                suggestions = False
+            # Les noms ODOO de toute la facture sont nécessaires avant la fusion
+            clean_batches = list(clean_batches)
+            self.events.progress('catalogue', "Récupération des articles de la facture...")
+            with profiler.stage("catalogue"):
+                articles_data, correspondance = self._load_invoice_catalog(articles_data, clean_batches, correspondance)
+
+        if isinstance(clean_batches, list):
+            # Sinon la fusion suit l'extraction, page par page
+            self.events.progress('fusion', "Fusion avec les articles...")
+        merged_batches = list(profiler.track("fusion", self.data_processor.iter_merge_batches(
+            clean_batches, articles_data, correspondance
+        )))
+        del clean_batches
+
+        with profiler.stage("concatenation"):
+            df_processed, df_unlinked_rl, df_unlinked_od = self.data_processor.concatenate_merged_batches(merged_batches)
+
+        self.events.progress('preparation_import', "Préparation du fichier d'import...")
+        import_batches = list(profiler.track("preparation_import", self.data_processor.iter_import_batches(
+            (batch[0] for batch in merged_batches), ref_commande, id_fourni
+        )))
+
+        df_suggestions = None
+        if suggestions:
+            self.events.progress('suggestions', "Recherche de suggestions d'articles...")
+            with profiler.stage("suggestions"):
+                df_suggestions = self.data_processor.suggest_articles(
+                    df_unlinked_rl, df_unlinked_od, articles_data
+                )
+
+        excel_bytes = csv_bytes = None
+        if export:
+            self.events.progress('export', "Génération des fichiers...")
+            with profiler.stage("export"):
+                excel_bytes = self.file_exporter.export_batches_to_excel(merged_batches, df_suggestions).getvalue()
+                csv_bytes = self.file_exporter.export_batches_to_csv(import_batches).getvalue()
+        del merged_batches
+
+        return {
+            'df_processed': df_processed,
+            'df_unlinked_rl': df_unlinked_rl,
+            'df_unlinked_od': df_unlinked_od,
+            'df_import': pd.concat(import_batches),
+            'df_suggestions': df_suggestions,
+            'pdf_name': name,
+            'ref_commande': ref_commande,
+            'id_fourni': id_fourni,
+            'excel_bytes': excel_bytes,
+            'csv_bytes': csv_bytes,
+            'stage_timings': profiler.records,
+        }
+
+    def _clean_line_batches(self, pdf_data, profiler):
+        """
+        Lignes nettoyées de la facture par lots : liste du seul tableau en cache,
+        ou générateur des lignes extraites et nettoyées page par page.
+        """
+        cache_key = None
+        if self.extraction_cache is not None:
+            with profiler.stage("cache"):
+                cache_key = self.pdf_processor.cache_key(pdf_data)
+                df_clean = self.extraction_cache.get(cache_key)
+            if df_clean is not None:
+                self.events.info("♻️ Facture déjà analysée : lignes chargées depuis le cache")
+                return [df_clean]
+
+        self.events.progress('extraction', "Extraction et nettoyage des lignes du PDF...")
+        return self._iter_extracted_lines(pdf_data, profiler, cache_key)
+
+    def _iter_extracted_lines(self, pdf_data, profiler, cache_key):
+        """
+        Extraction, normalisation et nettoyage page par page, PDF lu directement en mémoire.
+
+        Raises:
+            ValueError: Si l'extraction échoue ou ne trouve aucune ligne article
+        """
+        # Le cache conserve le tableau complet : les lots ne sont gardés que pour lui
+        cached_batches = []
+        has_lines = False
+        try:
+            for batch in profiler.track("nettoyage", self.data_processor.iter_clean_batches(
+                profiler.track("extraction", self.pdf_processor.iter_tables_from_pdf(pdf_data))
+            )):
+                has_lines = True
+                if cache_key is not None:
+                    cached_batches.append(batch)
+                yield batch
+        except Exception as e:
+            raise ValueError(f"Échec de l'extraction PDF: {str(e)}") from e
+        if not has_lines:
+            raise ValueError("Échec de l'extraction PDF: Aucune ligne article trouvee dans le PDF")
+        self.events.success("✅ Extraction PDF terminée")
+
+        if cached_batches:
+            with profiler.stage("cache"):
+                self.extraction_cache.put(cache_key, self.data_processor.concatenate_clean_batches(cached_batches))
+
+    def _load_invoice_catalog(self, catalog_provider, clean_batches, correspondance):
+        """Articles des seuls noms ODOO de la facture, via la correspondance."""
+        if not isinstance(correspondance, CorrespondanceIndex):
+            correspondance = CorrespondanceIndex.load(correspondance, self.data_processor.correspondance_cache)
+        refs = pd.concat([batch[['REF.']] for batch in clean_batches])
+        names = correspondance.annotate(refs)['Nom ODOO'].dropna().unique().tolist()
+
+        df_articles = catalog_provider(names)
+        if df_articles is None:
+            raise ValueError("Échec de la récupération des articles de la facture")
+        self.events.info(f"📦 {len(df_articles)} articles récupérés pour {len(names)} noms ODOO de la facture")
+        return df_articles, correspondance
+
+    @staticmethod
+    def invoice_name(pdf_source):
+        """Nom de la facture : nom du fichier sans extension."""
+        filename = getattr(pdf_source, 'name', None)
+        if filename is None and isinstance(pdf_source, (str, os.PathLike)):
+            filename = os.fspath(pdf_source)
+        if not filename:
+            return 'facture'
+        return os.path.splitext(os.path.basename(filename))[0]
+
+    @staticmethod
+    def _read_pdf(pdf_source):
+        """Contenu du PDF, lu une seule fois pour la cle de cache et l'extraction."""
+        if isinstance(pdf_source, (str, os.PathLike)):
+            with open(pdf_source, 'rb') as pdf_file:
+                return pdf_file.read()
+        return PDFProcessor._as_pdf_buffer(pdf_source)
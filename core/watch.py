@@ -0,0 +1,344 @@
+"""
+Surveillance d'un dossier de factures.
+
+Les PDF deposes dans le dossier d'entree sont traites des que leur taille et
+leur date de modification n'evoluent plus (copie terminee). Les fichiers
+d'import sont ecrits dans le dossier de sortie, et le hash du contenu de
+chaque facture traitee est enregistre dans une base SQLite : apres un
+redemarrage, une facture traitee avec succes n'est jamais retraitee, meme
+renommee. Une facture en erreur est retentee quand le catalogue ou la
+correspondance change, ou apres Config.WATCH_RETRY_SECONDS.
+
+Le catalogue et la correspondance restent charges en memoire entre deux
+factures ; ils ne sont relus que si leur fichier est modifie.
+"""
+import datetime
+import logging
+import os
+import sqlite3
+import time
+
+from .article_index import ArticleIndex
+from .batch import load_catalog
+from .config import Config
+from .correspondance_index import CorrespondanceIndex
+from .disk_cache import DiskCache, content_key
+from .file_exporter import FileExporter
+from .pipeline import InvoicePipeline
+
+
+logger = logging.getLogger('relais_local')
+
+
+class ProcessedInvoices:
+    """Base SQLite des factures deja traitees, indexees par hash du contenu."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS factures (
+                hash TEXT PRIMARY KEY,
+                fichier TEXT NOT NULL,
+                statut TEXT NOT NULL,
+                lignes INTEGER,
+                fichier_import TEXT,
+                erreur TEXT,
+                traite_le TEXT NOT NULL,
+                sources TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(factures)")}
+        if 'sources' not in columns:
+            # Base creee avant l'enregistrement des sources
+            self.connection.execute("ALTER TABLE factures ADD COLUMN sources TEXT")
+        self.connection.commit()
+
+    def __contains__(self, content_hash):
+        """Facture deja traitee avec succes."""
+        row = self.connection.execute(
+            "SELECT 1 FROM factures WHERE hash = ? AND statut = 'OK'", (content_hash,)
+        ).fetchone()
+        return row is not None
+
+    def failure(self, content_hash):
+        """
+        Dernier echec enregistre pour ce contenu.
+
+        Returns:
+            tuple: (signature des sources, secondes depuis l'echec), ou None
+        """
+        row = self.connection.execute(
+            "SELECT sources, traite_le FROM factures WHERE hash = ? AND statut = 'Erreur'", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        failed_at = datetime.datetime.fromisoformat(row[1])
+        return row[0], (datetime.datetime.now() - failed_at).total_seconds()
+
+    def record(self, content_hash, path, status, lines=None, import_path=None, error=None, sources=None):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO factures "
+            "(hash, fichier, statut, lignes, fichier_import, erreur, traite_le, sources) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                content_hash, path, status, lines, import_path, error,
+                datetime.datetime.now().isoformat(timespec='seconds'), sources,
+            ),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class InvoiceWatcher:
+    """Traite en continu les factures deposees dans un dossier."""
+
+    STATE_NAME = 'factures_traitees.sqlite'
+
+    def __init__(self, inbox, outbox, catalog_path, correspondance_path, state_path=None,
+                 poll_seconds=None, settle_seconds=None, ref_commande='{facture}', id_fourni=None,
+                 cache_dir=None, retry_seconds=None):
+        """
+        Args:
+            inbox (str): Dossier surveille
+            outbox (str): Dossier des fichiers d'import et rapports produits
+            catalog_path (str): CSV product.product ou instantane Parquet du catalogue Odoo
+            correspondance_path (str): Fichier Correspondance.xlsx
+            state_path (str): Base SQLite des factures traitees (dans outbox par defaut)
+            poll_seconds (float): Intervalle entre deux parcours du dossier
+            settle_seconds (float): Duree sans modification avant de traiter un fichier
+            ref_commande (str): Reference commande, '{facture}' etant remplace par le nom de la facture
+            id_fourni (str): ID externe du fournisseur (Config par defaut)
+            cache_dir (str): Dossier du cache disque des correspondances, None pour ne pas en utiliser
+            retry_seconds (float): Delai avant de retenter une facture en erreur si les sources n'ont pas change
+        """
+        self.config = Config()
+        self.inbox = inbox
+        self.outbox = outbox
+        self.catalog_path = catalog_path
+        self.correspondance_path = correspondance_path
+        self.poll_seconds = poll_seconds or self.config.WATCH_POLL_SECONDS
+        self.settle_seconds = self.config.WATCH_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self.retry_seconds = self.config.WATCH_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self.ref_commande = ref_commande
+        self.id_fourni = id_fourni or self.config.ID_FOURNI_DEFAULT
+        self.running = False
+
+        os.makedirs(self.outbox, exist_ok=True)
+        self.state = ProcessedInvoices(state_path or os.path.join(self.outbox, self.STATE_NAME))
+        correspondance_cache = None
+        if cache_dir:
+            correspondance_cache = DiskCache(
+                os.path.join(cache_dir, 'correspondance'), self.config.CORRESPONDANCE_CACHE_MAX_BYTES
+            )
+        self.correspondance_cache = correspondance_cache
+        self.pipeline = InvoicePipeline(correspondance_cache=correspondance_cache)
+        self.file_exporter = FileExporter()
+
+        # Fichier -> (taille, date de modification, instant de la derniere evolution)
+        self._pending = {}
+        # Fichier -> (taille, date de modification) deja examines
+        self._seen = {}
+        # Fichier en echec -> (signature des sources, instant de l'echec)
+        self._failed = {}
+        self._sources = {}
+        self.articles = None
+        self.correspondance = None
+
+    def run(self):
+        """Boucle de surveillance, jusqu'a stop() ou une interruption clavier."""
+        self.running = True
+        logger.info("Surveillance de %s (sortie : %s)", self.inbox, self.outbox)
+        try:
+            while self.running:
+                self.poll()
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            self.state.close()
+
+    def stop(self):
+        self.running = False
+
+    def poll(self):
+        """
+        Parcourt le dossier une fois et traite les factures stables.
+
+        Returns:
+            list: Fichiers traites pendant ce parcours
+        """
+        processed = []
+        now = time.monotonic()
+        present = set()
+        sources = self._source_signature() if self._failed else None
+
+        for entry in sorted(os.scandir(self.inbox), key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.lower().endswith('.pdf'):
+                continue
+            path = entry.path
+            present.add(path)
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+
+            if self._seen.get(path) == signature:
+                # Fichier deja examine : seul un echec a retenter le fait traiter de nouveau
+                if not self._retry_due(path, sources, now):
+                    continue
+            else:
+                pending = self._pending.get(path)
+                if pending is None or pending[0] != signature:
+                    # Nouveau fichier, ou encore en cours de copie
+                    self._pending[path] = (signature, now)
+                    if self.settle_seconds > 0:
+                        continue
+                    pending = self._pending[path]
+                if now - pending[1] < self.settle_seconds:
+                    continue
+
+                del self._pending[path]
+                self._seen[path] = signature
+            if self.process_file(path):
+                processed.append(path)
+
+        # Fichiers retires du dossier : on oublie leur suivi
+        for path in list(self._pending):
+            if path not in present:
+                del self._pending[path]
+        for path in list(self._seen):
+            if path not in present:
+                del self._seen[path]
+                self._failed.pop(path, None)
+        return processed
+
+    def process_file(self, path):
+        """
+        Traite une facture si son contenu n'a jamais ete traite avec succes.
+
+        Une facture en erreur n'est retentee que si le catalogue ou la
+        correspondance ont change depuis l'echec, ou apres retry_seconds. Un
+        catalogue ou une correspondance illisible n'est pas impute a la
+        facture : rien n'est enregistre et elle sera retentee.
+
+        Returns:
+            bool: True si la facture a ete traitee (avec succes ou en erreur)
+        """
+        self._failed.pop(path, None)
+        try:
+            with open(path, 'rb') as pdf_file:
+                pdf_data = pdf_file.read()
+        except OSError as e:
+            logger.warning("Lecture impossible de %s : %s", path, e)
+            return False
+
+        content_hash = content_key(pdf_data)
+        if content_hash in self.state:
+            logger.debug("Deja traitee : %s", path)
+            return False
+
+        now = time.monotonic()
+        try:
+            sources = self._refresh_sources()
+        except Exception as e:
+            logger.error("Catalogue ou correspondance indisponible, %s sera retentee : %s", path, e)
+            self._failed[path] = (self._source_signature(), now)
+            return False
+
+        failure = self.state.failure(content_hash)
+        if failure is not None and failure[0] == sources and failure[1] < self.retry_seconds:
+            logger.debug("En erreur, retentee plus tard : %s", path)
+            self._failed[path] = (sources, now - failure[1])
+            return False
+
+        name = InvoicePipeline.invoice_name(path)
+        try:
+            results = self.pipeline.run(
+                pdf_data,
+                self.articles,
+                self.correspondance,
+                self.ref_commande.format(facture=name),
+                self.id_fourni,
+                name=name,
+                export=False,
+            )
+            import_path = self._write_outputs(name, content_hash, results)
+        except Exception as e:
+            logger.error("Echec du traitement de %s : %s", path, e)
+            self.state.record(content_hash, path, 'Erreur', error=str(e), sources=sources)
+            self._failed[path] = (sources, now)
+            return True
+
+        self.state.record(content_hash, path, 'OK', len(results['df_processed']), import_path, sources=sources)
+        logger.info(
+            "%s : %s lignes, %s non liees RL, %s non liees ODOO",
+            name, len(results['df_processed']), len(results['df_unlinked_rl']), len(results['df_unlinked_od']),
+        )
+        return True
+
+    def _retry_due(self, path, sources, now):
+        """Facture en echec a retenter : sources modifiees ou delai ecoule."""
+        failed = self._failed.get(path)
+        if failed is None:
+            return False
+        return failed[0] != sources or now - failed[1] >= self.retry_seconds
+
+    def _source_signature(self):
+        """Taille et date de modification du catalogue et de la correspondance (None si illisibles)."""
+        try:
+            stats = [os.stat(path) for path in (self.catalog_path, self.correspondance_path)]
+        except OSError:
+            return None
+        return ';'.join(f"{stat.st_size}:{stat.st_mtime_ns}" for stat in stats)
+
+    def _refresh_sources(self):
+        """
+        Recharge catalogue et correspondance seulement si leur fichier a change.
+
+        Returns:
+            str: Signature des sources chargees
+        """
+        signatures = {}
+        for key, path in (('catalog', self.catalog_path), ('correspondance', self.correspondance_path)):
+            stat = os.stat(path)
+            signatures[key] = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        if self.articles is None or signatures['catalog'] != self._sources.get('catalog'):
+            self.articles = ArticleIndex.for_catalog(load_catalog(self.catalog_path))
+            logger.info("Catalogue charge : %s articles", self.articles.article_count)
+        if self.correspondance is None or signatures['correspondance'] != self._sources.get('correspondance'):
+            self.correspondance = CorrespondanceIndex.load(self.correspondance_path, self.correspondance_cache)
+            logger.info("Correspondance chargee : %s references", len(self.correspondance))
+        self._sources = signatures
+        return f"{signatures['catalog']};{signatures['correspondance']}"
+
+    def _write_outputs(self, name, content_hash, results):
+        """
+        Ecrit le CSV d'import et le rapport Excel de la facture, via des fichiers temporaires.
+
+        Les noms portent le debut du hash du contenu : deux factures de meme
+        nom mais de contenus differents ne s'ecrasent pas.
+        """
+        stem = f"{name}_{content_hash[:8]}"
+        import_path = os.path.join(self.outbox, f"{stem}.csv")
+        report_path = os.path.join(self.outbox, f"{stem}_rapport.xlsx")
+        outputs = [
+            (import_path, self.file_exporter.export_to_csv(results['df_import'])),
+            (report_path, self.file_exporter.export_to_excel(
+                results['df_processed'], results['df_unlinked_rl'],
+                results['df_unlinked_od'], results['df_suggestions'],
+            )),
+        ]
+        for path, buffer in outputs:
+            # Un fichier n'apparait dans la sortie qu'une fois complet
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as output:
+                output.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+        return import_path
@@ -0,0 +1,148 @@
+import datetime
+from concurrent.futures import Future
+
+from core.catalog_snapshot import CatalogSnapshot
+from core.config import Config
+from core.odoo_connector import OdooConnector
+
+T0 = '2026-01-01 08:00:00'
+T1 = '2026-01-01 09:00:00'
+T2 = '2026-01-01 09:30:00'
+
+
+class FakeExecutor:
+    """Executeur des plans de lecture sur des tables Odoo en memoire."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def submit(self, model, method, domain, fields=None):
+        records = [record for record in self.tables[model] if self._match(record, domain)]
+        future = Future()
+        if method == 'search':
+            future.set_result([record['id'] for record in records])
+        else:
+            future.set_result([{field: record.get(field) for field in ['id', *fields]} for record in records])
+        return future
+
+    def call(self, model, method, *args):
+        return self.submit(model, method, *args).result()
+
+    @staticmethod
+    def _match(record, domain):
+        operators = {
+            '=': lambda value, expected: value == expected,
+            'in': lambda value, expected: value in expected,
+            '>=': lambda value, expected: value >= expected,
+        }
+        return all(operators[op](record.get(field), value) for field, op, value in domain)
+
+
+def odoo_tables():
+    return {
+        'product.product': [
+            {'id': 1, 'name': 'Lait', 'product_tmpl_id': [10, 'Lait'], 'uom_po_id': [1, 'U'], 'active': True, 'write_date': T0},
+            {'id': 2, 'name': 'Oeufs', 'product_tmpl_id': [20, 'Oeufs'], 'uom_po_id': [1, 'U'], 'active': True, 'write_date': T0},
+            {'id': 4, 'name': 'Pain', 'product_tmpl_id': [10, 'Lait'], 'uom_po_id': [1, 'U'], 'active': True, 'write_date': T0},
+        ],
+        'ir.model.data': [
+            {'id': 101, 'model': 'product.product', 'res_id': 1, 'complete_name': '__export__.lait', 'write_date': T0},
+            {'id': 102, 'model': 'product.product', 'res_id': 2, 'complete_name': '__export__.oeufs', 'write_date': T0},
+            {'id': 104, 'model': 'product.product', 'res_id': 4, 'complete_name': '__export__.pain', 'write_date': T0},
+            {'id': 201, 'model': 'account.tax', 'res_id': 5, 'complete_name': 'l10n_fr.tva_5_5', 'write_date': T0},
+            {'id': 202, 'model': 'account.tax', 'res_id': 6, 'complete_name': 'l10n_fr.tva_20', 'write_date': T0},
+        ],
+        'product.supplierinfo': [],
+        'product.template': [
+            {'id': 10, 'supplier_taxes_id': [5], 'write_date': T0},
+            {'id': 20, 'supplier_taxes_id': [5], 'write_date': T0},
+            {'id': 30, 'supplier_taxes_id': [6], 'write_date': T0},
+        ],
+    }
+
+
+def full_snapshot(path, executor):
+    """Instantane complet, comme apres un premier telechargement du catalogue."""
+    queries = OdooConnector.CATALOG_QUERIES
+    tables = {name: executor.call(model, 'search_read', domain, fields) for name, (model, domain, fields) in queries.items()}
+    tables['templates'] = executor.call('product.template', 'search_read', [('id', 'in', [10, 20])], OdooConnector.TEMPLATE_FIELDS)
+    tables['tax_external_ids'] = executor.call(
+        'ir.model.data', 'search_read', [('model', '=', 'account.tax'), ('res_id', 'in', [5])], ['res_id', 'complete_name']
+    )
+    snapshot = CatalogSnapshot(path)
+    snapshot.replace_all(tables, 'signature')
+    return snapshot
+
+
+def test_replace_all_and_apply_changes_keep_the_latest_watermark(tmp_path):
+    snapshot = CatalogSnapshot(tmp_path / 'catalogue.sqlite')
+    snapshot.replace_all({'products': [{'id': 1, 'name': 'Lait', 'write_date': T1}]}, 'signature')
+
+    assert snapshot.is_ready('signature')
+    assert not snapshot.is_ready('autres requetes')
+    assert snapshot.watermark == T1
+
+    # Un enregistrement relu (recouvrement) ne fait pas reculer le filigrane
+    snapshot.apply_changes({'products': [{'id': 1, 'name': 'Lait entier', 'write_date': T0}]}, {'products': [1]})
+    assert snapshot.watermark == T1
+    assert snapshot.load_tables()['products']['name'].tolist() == ['Lait entier']
+    snapshot.close()
+
+
+def test_sync_snapshot_applies_updates_archives_new_templates_and_taxes(tmp_path):
+    tables = odoo_tables()
+    executor = FakeExecutor(tables)
+    snapshot = full_snapshot(tmp_path / 'catalogue.sqlite', executor)
+    assert snapshot.watermark == T0
+
+    products = {record['id']: record for record in tables['product.product']}
+    # Variante renommee
+    products[1].update(name='Lait entier', write_date=T2)
+    # Variante archivee
+    products[2].update(active=False, write_date=T2)
+    # Nouvelle variante sur un modele existant mais pas encore dans l'instantane
+    tables['product.product'].append(
+        {'id': 3, 'name': 'Beurre', 'product_tmpl_id': [30, 'Beurre'], 'uom_po_id': [1, 'U'], 'active': True, 'write_date': T2}
+    )
+    tables['ir.model.data'].append(
+        {'id': 103, 'model': 'product.product', 'res_id': 3, 'complete_name': '__export__.beurre', 'write_date': T2}
+    )
+    # Taxe fournisseur changee sur un modele
+    tables['product.template'][0].update(supplier_taxes_id=[6], write_date=T2)
+    # Transaction commencee avant la synchronisation precedente, validee apres : write_date < filigrane
+    products[4].update(name='Pain complet', write_date='2026-01-01 07:58:00')
+    snapshot.close()
+
+    snapshot = CatalogSnapshot(tmp_path / 'catalogue.sqlite')
+    OdooConnector()._sync_snapshot(executor, snapshot, OdooConnector.CATALOG_QUERIES)
+    result = snapshot.load_tables()
+
+    assert dict(zip(result['products']['id'], result['products']['name'])) == {1: 'Lait entier', 3: 'Beurre', 4: 'Pain complet'}
+    assert dict(zip(result['templates']['id'], result['templates']['supplier_taxes_id'])) == {10: [6], 30: [6]}
+    assert result['tax_external_ids']['complete_name'].tolist() == ['l10n_fr.tva_20']
+    assert snapshot.watermark == T2
+
+    catalog = OdooConnector().assemble_catalog(result)
+    assert sorted(catalog['Article/ID']) == ['__export__.beurre', '__export__.lait', '__export__.pain']
+    assert sorted(catalog['Taxes fournisseur/ID'].unique()) == ['l10n_fr.tva_20']
+    snapshot.close()
+
+
+def test_sync_snapshot_rereads_the_overlap_before_the_watermark(tmp_path):
+    tables = odoo_tables()
+    executor = FakeExecutor(tables)
+    snapshot = full_snapshot(tmp_path / 'catalogue.sqlite', executor)
+
+    requested = []
+    submit = executor.submit
+
+    def recording_submit(model, method, domain, fields=None):
+        requested.extend(term for term in domain if term[0] == 'write_date')
+        return submit(model, method, domain, fields)
+
+    executor.submit = recording_submit
+    OdooConnector()._sync_snapshot(executor, snapshot, OdooConnector.CATALOG_QUERIES)
+
+    since = datetime.datetime.fromisoformat(T0) - datetime.timedelta(seconds=Config.ODOO_SYNC_OVERLAP_SECONDS)
+    assert set(requested) == {('write_date', '>=', since.strftime('%Y-%m-%d %H:%M:%S'))}
+    snapshot.close()
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from core.data_processor import DataProcessor
+
+
+def test_parse_french_numbers_ignores_surrounding_whitespace():
+    # Regression : "12 K" devient "12 " une fois le texte parasite retire
+    column = pd.Series(['12 K', ' 3,2', '4 ', '', None], name='QTE')
+
+    numbers = DataProcessor()._parse_french_numbers(column, noise=DataProcessor.QUANTITY_NOISE)
+
+    assert numbers.tolist() == [12.0, 3.2, 4.0, 0.0, 0.0]
+    assert numbers.dtype == 'float64'
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from core.odoo_connector import OdooConnector
+
+
+def test_assemble_catalog_keeps_one_row_per_variant_with_several_external_ids():
+    tables = {
+        'products': pd.DataFrame([
+            {'id': 1, 'name': 'Lait', 'product_tmpl_id': [10, 'Lait'], 'uom_po_id': [1, 'U']},
+            {'id': 2, 'name': 'Oeufs', 'product_tmpl_id': [10, 'Lait'], 'uom_po_id': [1, 'U']},
+        ]),
+        # Variante 1 exportee puis reprise par un module : deux ID externes
+        'external_ids': pd.DataFrame([
+            {'id': 12, 'res_id': 1, 'complete_name': 'epicerie.lait'},
+            {'id': 11, 'res_id': 1, 'complete_name': '__export__.lait'},
+            {'id': 13, 'res_id': 2, 'complete_name': '__export__.oeufs'},
+        ]),
+        'suppliers': pd.DataFrame(),
+        'templates': pd.DataFrame([{'id': 10, 'supplier_taxes_id': [5]}]),
+        'tax_external_ids': pd.DataFrame([
+            {'id': 22, 'res_id': 5, 'complete_name': 'l10n_fr.tva_5_5'},
+            {'id': 21, 'res_id': 5, 'complete_name': '__export__.tva_5_5'},
+        ]),
+    }
+
+    catalog = OdooConnector().assemble_catalog(tables)
+
+    assert catalog['Article ID Odoo'].tolist() == [1, 2]
+    assert catalog['Article/ID'].tolist() == ['__export__.lait', '__export__.oeufs']
+    assert catalog['Taxes fournisseur/ID'].tolist() == ['__export__.tva_5_5', '__export__.tva_5_5']
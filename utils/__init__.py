@@ -1,10 +0,0 @@
-"""
-Package utils - Fonctions utilitaires pour l'application
-"""
-
-from .helpers import save_uploaded_file, cleanup_temp_file
-
-__all__ = [
-    'save_uploaded_file',
-    'cleanup_temp_file'
-]
\ No newline at end of file
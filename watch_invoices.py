@@ -0,0 +1,80 @@
+"""
+Surveillance en continu d'un dossier de factures Relais Local.
+
+Chaque PDF depose dans le dossier d'entree est traite des que sa copie est
+terminee : CSV d'import et rapport Excel dans le dossier de sortie. Les
+factures deja traitees (meme contenu) sont ignorees, y compris apres un
+redemarrage.
+
+Usage :
+    python watch_invoices.py partage/factures --sortie partage/imports \\
+        --catalogue product.product.csv --correspondance Correspondance.xlsx
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+
+from core import Config, InvoiceWatcher
+
+
+def parse_args(argv=None):
+    config = Config()
+    parser = argparse.ArgumentParser(description="Surveillance d'un dossier de factures Relais Local")
+    parser.add_argument('entree', help="Dossier surveille")
+    parser.add_argument('--sortie', required=True, help="Dossier des fichiers d'import produits")
+    parser.add_argument('--catalogue', required=True,
+                        help="Catalogue des articles : CSV product.product ou instantane Parquet d'Odoo")
+    parser.add_argument('--correspondance', required=True, help="Fichier Correspondance.xlsx")
+    parser.add_argument('--etat', default=None,
+                        help=f"Base SQLite des factures traitees (defaut : <sortie>/{InvoiceWatcher.STATE_NAME})")
+    parser.add_argument('--intervalle', type=float, default=config.WATCH_POLL_SECONDS,
+                        help="Secondes entre deux parcours du dossier")
+    parser.add_argument('--stabilite', type=float, default=config.WATCH_SETTLE_SECONDS,
+                        help="Secondes sans modification avant de traiter un fichier")
+    parser.add_argument('--reessai', type=float, default=config.WATCH_RETRY_SECONDS,
+                        help="Secondes avant de retenter une facture en erreur si catalogue et correspondance n'ont pas change")
+    parser.add_argument('--ref-commande', default='{facture}',
+                        help="Reference commande ; {facture} est remplace par le nom de la facture")
+    parser.add_argument('--id-fournisseur', default=config.ID_FOURNI_DEFAULT)
+    parser.add_argument('--verbeux', action='store_true', help="Journal detaille")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbeux else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    for path in (args.catalogue, args.correspondance):
+        if not os.path.isfile(path):
+            logging.error("Fichier introuvable : %s", path)
+            return 2
+    if not os.path.isdir(args.entree):
+        logging.error("Dossier introuvable : %s", args.entree)
+        return 2
+
+    watcher = InvoiceWatcher(
+        args.entree,
+        args.sortie,
+        args.catalogue,
+        args.correspondance,
+        state_path=args.etat,
+        poll_seconds=args.intervalle,
+        settle_seconds=args.stabilite,
+        retry_seconds=args.reessai,
+        ref_commande=args.ref_commande,
+        id_fourni=args.id_fournisseur,
+        cache_dir=Config.CACHE_DIR,
+    )
+    # Arret propre demande par le gestionnaire de services
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    watcher.run()
+    logging.info("Surveillance arretee")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())